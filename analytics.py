@@ -0,0 +1,83 @@
+from collections import namedtuple
+import numpy as np
+from sqlalchemy import select, case, func
+from database.models import User, Subscription
+from services import CostNormalizer
+
+# Коды периодов оплаты в массивах
+PERIODS = ("monthly", "yearly", "weekly")
+# Множители цены к стоимости в месяц и в год по коду периода
+MONTHLY_FACTORS = np.array([CostNormalizer.factors(period)[0] for period in PERIODS])
+YEARLY_FACTORS = np.array([CostNormalizer.factors(period)[1] for period in PERIODS])
+
+SubscriptionArrays = namedtuple("SubscriptionArrays", ["ids", "names", "price", "period",
+                                                       "category", "payment_day", "next_date"])
+
+
+# Загрузить активные подписки пользователя в массивы по столбцам
+async def load_subscription_arrays(session, telegram_id):
+    """Загрузить активные подписки пользователя в массивы по столбцам
+
+    Один запрос без ORM-объектов: период кодируется числом в SQL
+    (неизвестный период - как ежемесячный), пустая категория - 0.
+    """
+    period_code = case(*((Subscription.billing_period == period, code)
+                         for code, period in enumerate(PERIODS) if code), else_=0)
+    result = await session.execute(
+        select(Subscription.id, Subscription.name, Subscription.price, period_code,
+               func.coalesce(Subscription.category_id, 0), Subscription.payment_day,
+               Subscription.next_payment_date)
+        .join(User, User.id == Subscription.user_id)
+        .where(User.telegram_id == telegram_id, Subscription.is_active == True)
+        .order_by(Subscription.id))
+    rows = result.all()
+
+    columns = list(zip(*rows)) or [()] * len(SubscriptionArrays._fields)
+    return SubscriptionArrays(
+        ids=np.array(columns[0], dtype=np.int64),
+        names=np.array(columns[1], dtype=object),
+        price=np.array(columns[2], dtype=np.float64),
+        period=np.array(columns[3], dtype=np.int64),
+        category=np.array(columns[4], dtype=np.int64),
+        payment_day=np.array(columns[5], dtype=np.int64),
+        next_date=np.array(columns[6], dtype="datetime64[D]"),
+    )
+
+
+# Посчитать статистику расходов по массивам подписок
+def compute_stats(arrays, top=3):
+    """Посчитать статистику расходов по массивам подписок
+
+    Возвращает None, если подписок нет. Категории отсортированы по убыванию
+    расходов, доли - в процентах от расходов в месяц.
+    """
+    if not len(arrays.ids):
+        return None
+
+    monthly = arrays.price * MONTHLY_FACTORS[arrays.period]
+    yearly = arrays.price * YEARLY_FACTORS[arrays.period]
+    total_monthly = monthly.sum()
+
+    category_ids, category_index = np.unique(arrays.category, return_inverse=True)
+    category_monthly = np.bincount(category_index, weights=monthly)
+    category_order = np.argsort(-category_monthly, kind="stable")
+    share = category_monthly / total_monthly * 100 if total_monthly else category_monthly * 0
+
+    top_order = np.argsort(-monthly, kind="stable")[:top]
+
+    period_count = np.bincount(arrays.period, minlength=len(PERIODS))
+    period_monthly = np.bincount(arrays.period, weights=monthly, minlength=len(PERIODS))
+
+    return {
+        "count": len(arrays.ids),
+        "monthly": float(total_monthly),
+        "yearly": float(yearly.sum()),
+        "average": float(monthly.mean()),
+        "categories": [(int(category_ids[i]), float(category_monthly[i]), float(share[i]))
+                       for i in category_order],
+        "top": [(arrays.names[i], float(arrays.price[i]), PERIODS[arrays.period[i]],
+                 float(monthly[i])) for i in top_order],
+        "periods": [(PERIODS[code], int(period_count[code]), float(period_monthly[code]))
+                    for code in range(len(PERIODS)) if period_count[code]],
+        "next_date": arrays.next_date.min().item(),
+    }
@@ -0,0 +1 @@
+"""Бенчмарки сервисов и фоновых задач. Запуск из корня проекта: python -m benchmarks.<имя>"""
@@ -0,0 +1,90 @@
+"""Время прогноза платежей в зависимости от числа подписок пользователя
+
+Запуск: python -m benchmarks.bench_forecast
+Векторный forecast_payments сравнивается с перебором платежей по одной
+подписке через SubscriptionService._shift_months.
+"""
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from analytics import SubscriptionArrays, PERIODS
+from forecast import forecast_payments, month_start
+from services import SubscriptionService
+
+SUBSCRIPTION_COUNTS = [10, 100, 1000, 5000, 20000]
+HORIZONS = [3, 12, 24]
+LOOP_LIMIT = 5000  # перебор дольше этого размера не запускается
+
+
+def make_arrays(count, today):
+    """Синтетические подписки с датами вокруг сегодняшнего дня"""
+    rnd = random.Random(count)
+    return SubscriptionArrays(
+        ids=np.arange(count, dtype=np.int64),
+        names=np.array([f"Подписка {i}" for i in range(count)], dtype=object),
+        price=np.array([rnd.choice([99, 199, 399, 999]) for _ in range(count)], dtype=np.float64),
+        period=np.array([rnd.randrange(len(PERIODS)) for _ in range(count)], dtype=np.int64),
+        category=np.zeros(count, dtype=np.int64),
+        payment_day=np.array([rnd.randint(1, 31) for _ in range(count)], dtype=np.int64),
+        next_date=np.array([today + timedelta(days=rnd.randint(0, 30)) for _ in range(count)],
+                           dtype="datetime64[D]"),
+    )
+
+
+def loop_forecast(arrays, months, today):
+    """Перебор платежей по одной подписке"""
+    end = month_start(today, months)
+    payments = []
+    for i in range(len(arrays.ids)):
+        period = PERIODS[arrays.period[i]]
+        next_date = arrays.next_date[i].item()
+        payment_day = int(arrays.payment_day[i])
+        k = 0
+        while True:
+            if period == "weekly":
+                payment_date = next_date + timedelta(weeks=k)
+            elif k == 0:
+                payment_date = next_date
+            else:
+                step = 1 if period == "monthly" else 12
+                payment_date = SubscriptionService._shift_months(next_date, k * step, payment_day)
+            if payment_date >= end:
+                break
+            if payment_date >= today:
+                payments.append((payment_date, i, arrays.price[i]))
+            k += 1
+    payments.sort()
+    return payments
+
+
+def measure(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    today = date.today()
+    print(f"{'subs':>7} {'months':>7} {'payments':>9} {'numpy ms':>9} {'loop ms':>9} {'speedup':>8}")
+    for count in SUBSCRIPTION_COUNTS:
+        arrays = make_arrays(count, today)
+        for months in HORIZONS:
+            vector_time, forecast = measure(lambda: forecast_payments(arrays, months, today))
+            if count <= LOOP_LIMIT:
+                loop_time, payments = measure(lambda: loop_forecast(arrays, months, today))
+                assert len(payments) == len(forecast.dates)
+                loop_text = f"{loop_time * 1000:>9.1f} {loop_time / vector_time:>7.1f}x"
+            else:
+                loop_text = f"{'-':>9} {'-':>8}"
+            print(f"{count:>7} {months:>7} {len(forecast.dates):>9} {vector_time * 1000:>9.1f} "
+                  f"{loop_text}")
+
+
+if __name__ == "__main__":
+    main()
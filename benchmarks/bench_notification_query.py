@@ -0,0 +1,79 @@
+"""Число запросов и время выборки кандидатов для ежедневных уведомлений
+
+Запуск: python -m benchmarks.bench_notification_query
+Количество запросов не должно зависеть от числа пользователей.
+"""
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database.models import Base, User, Subscription, Category
+from services import NotificationService
+
+USER_COUNTS = [100, 1000, 10000]
+SUBSCRIPTIONS_PER_USER = 5
+
+
+async def populate(session, users_count):
+    """Заполнить базу синтетическими пользователями и подписками"""
+    rnd = random.Random(users_count)
+    today = date.today()
+    categories = [Category(name=f"Категория {i}") for i in range(8)]
+    session.add_all(categories)
+    await session.flush()
+
+    await session.execute(insert(User), [
+        {"telegram_id": 10_000 + i, "notification_days": rnd.choice([0, 1, 3, 7])}
+        for i in range(users_count)
+    ])
+    user_ids = (await session.execute(select(User.id))).scalars().all()
+    await session.execute(insert(Subscription), [
+        {"user_id": user_id,
+         "name": f"Подписка {n}",
+         "price": rnd.choice([99, 199, 399, 999]),
+         "payment_day": rnd.randint(1, 28),
+         "billing_period": "monthly",
+         "category_id": rnd.choice(categories).id,
+         "is_active": True,
+         "notifications_enabled": True,
+         "next_payment_date": today + timedelta(days=rnd.randint(0, 30))}
+        for user_id in user_ids for n in range(SUBSCRIPTIONS_PER_USER)
+    ])
+    await session.commit()
+
+
+async def run(users_count):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        await populate(session, users_count)
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        started = time.perf_counter()
+        subscriptions = await NotificationService.get_subscriptions_for_notification(session)
+        for subscription in subscriptions:
+            NotificationService.format_notification_message(subscription)
+        elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+    return len(statements), len(subscriptions), elapsed
+
+
+async def main():
+    print(f"{'users':>8} {'queries':>8} {'matches':>8} {'seconds':>8}")
+    for users_count in USER_COUNTS:
+        queries, matches, elapsed = await run(users_count)
+        print(f"{users_count:>8} {queries:>8} {matches:>8} {elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,240 @@
+"""Время запросов сервисов и задач планировщика на синтетической базе
+
+Запуск: python -m benchmarks.bench_services [--users 100000] [--subscriptions 1000000]
+                                            [--rounds 20] [--compare результаты.json]
+База создается benchmarks.dataset и переиспользуется в течение дня. Запросы
+пользователя выполняются для разных случайных пользователей, изменяющие
+данные задачи - каждый раз на свежей копии базы. Задачи планировщика
+отправляют сообщения в имитацию Bot API в памяти процесса без лимита частоты.
+Результаты сохраняются в benchmarks/results/<время>-<коммит>.json (каталог в .gitignore,
+путь можно задать --output); с
+--compare печатается изменение медианы относительно прошлого запуска.
+"""
+import os
+import shutil
+import tempfile
+
+WORK_DIRECTORY = tempfile.mkdtemp()
+WORK_DATABASE = os.path.join(WORK_DIRECTORY, "bench.db")
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DATABASE}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{WORK_DATABASE}"
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import sqlite3  # noqa: E402
+import subprocess  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+from aiogram.types import Chat, Message  # noqa: E402
+
+from benchmarks.dataset import DEFAULT_USERS, DEFAULT_SUBSCRIPTIONS, FIRST_TELEGRAM_ID, \
+    dataset_path  # noqa: E402
+from config import config  # noqa: E402
+from database import get_async_db  # noqa: E402
+from database.database import db  # noqa: E402
+from scheduler import NotificationScheduler  # noqa: E402
+from sender import MessageSender  # noqa: E402
+from services import SubscriptionService, NotificationService  # noqa: E402
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+JOB_ROUNDS = 3
+
+
+class FakeSession(BaseSession):
+    """Сессия бота, которая отвечает на запросы без сети и считает их"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests += 1
+        if isinstance(method, SendMessage):
+            return Message(message_id=self.requests, date=datetime.now(),
+                           chat=Chat(id=method.chat_id, type="private"), text=method.text)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536,
+                             raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+# Заменить рабочую базу свежей копией исходной
+async def reset_database(source):
+    """Заменить рабочую базу свежей копией исходной"""
+    await db.async_engine.dispose()
+    db.engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(WORK_DATABASE + suffix):
+            os.remove(WORK_DATABASE + suffix)
+    shutil.copyfile(source, WORK_DATABASE)
+
+
+def summarize(timings, extra=None):
+    timings = sorted(timings)
+    result = {
+        "rounds": len(timings),
+        "min": timings[0],
+        "median": timings[len(timings) // 2],
+        "mean": sum(timings) / len(timings),
+        "p95": timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+        "max": timings[-1],
+    }
+    if extra:
+        result.update(extra)
+    return result
+
+
+# Замерить запрос сервиса для случайных пользователей
+async def bench_user_query(function, telegram_ids):
+    """Замерить запрос сервиса для случайных пользователей (новая сессия на раунд)"""
+    async with get_async_db() as session:
+        await function(session, telegram_ids[0])  # прогрев соединения и кэша страниц
+
+    timings = []
+    rows = 0
+    for telegram_id in telegram_ids:
+        async with get_async_db() as session:
+            started = time.perf_counter()
+            result = await function(session, telegram_id)
+            timings.append(time.perf_counter() - started)
+        rows += len(result) if isinstance(result, list) else 1
+    return summarize(timings, {"rows_per_call": rows / len(telegram_ids)})
+
+
+# Замерить изменяющую данные операцию на свежих копиях базы
+async def bench_on_fresh_copy(source, rounds, function):
+    """Замерить изменяющую данные операцию на свежих копиях базы"""
+    timings = []
+    extra = {}
+    for _ in range(rounds):
+        await reset_database(source)
+        started = time.perf_counter()
+        extra = await function() or {}
+        timings.append(time.perf_counter() - started)
+    return summarize(timings, extra)
+
+
+async def run(args):
+    source = dataset_path(args.users, args.subscriptions, args.seed)
+    await reset_database(source)
+    rnd = random.Random(args.seed)
+    telegram_ids = [FIRST_TELEGRAM_ID + rnd.randrange(args.users) for _ in range(args.rounds)]
+    results = {}
+
+    results["get_user_subscriptions"] = await bench_user_query(
+        SubscriptionService.get_user_subscriptions, telegram_ids)
+    results["get_upcoming_payments"] = await bench_user_query(
+        SubscriptionService.get_upcoming_payments, telegram_ids)
+    results["calculate_totals"] = await bench_user_query(
+        SubscriptionService.calculate_totals, telegram_ids)
+
+    timings = []
+    for _ in range(JOB_ROUNDS):
+        async with get_async_db() as session:
+            started = time.perf_counter()
+            subscriptions = await NotificationService.get_subscriptions_for_notification(session)
+            timings.append(time.perf_counter() - started)
+    results["get_subscriptions_for_notification"] = summarize(
+        timings, {"rows": len(subscriptions)})
+
+    async def update_dates():
+        async with get_async_db() as session:
+            return {"advanced": await SubscriptionService.update_next_payment_dates(session)}
+
+    results["update_next_payment_dates"] = await bench_on_fresh_copy(
+        source, JOB_ROUNDS, update_dates)
+
+    # Напоминания запланированы на полночь, чтобы очередь была готова к отправке в любое время суток
+    config.NOTIFICATION_HOUR = 0
+    session = FakeSession()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    scheduler = NotificationScheduler(bot)
+    scheduler.sender = MessageSender(bot, rate=10 ** 9, chat_interval=0)
+    for job in (scheduler.send_daily_notifications, scheduler.update_payment_dates,
+                scheduler.send_monthly_report):
+        async def run_job():
+            session.requests = 0
+            await job()
+            return {"messages": session.requests}
+
+        results[f"job_{job.__name__}"] = await bench_on_fresh_copy(source, JOB_ROUNDS, run_job)
+    await db.async_engine.dispose()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, previous=None):
+    print(f"{'benchmark':<42} {'median ms':>10} {'p95 ms':>10} {'rounds':>7}  extra")
+    for name, result in results.items():
+        extra = {key: value for key, value in result.items()
+                 if key not in ("rounds", "min", "median", "mean", "p95", "max")}
+        line = (f"{name:<42} {result['median'] * 1000:>10.2f} {result['p95'] * 1000:>10.2f} "
+                f"{result['rounds']:>7}  {json.dumps(extra, ensure_ascii=False)}")
+        if previous and name in previous:
+            change = result["median"] / previous[name]["median"] - 1
+            line += f"  {change:+.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--subscriptions", type=int, default=DEFAULT_SUBSCRIPTIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=20, help="раундов для запросов пользователя")
+    parser.add_argument("--compare", help="файл результатов прошлого запуска")
+    parser.add_argument("--output", help="куда сохранить результаты")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(WORK_DIRECTORY, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "dataset": {"users": args.users, "subscriptions": args.subscriptions, "seed": args.seed},
+        "benchmarks": results,
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            previous = json.load(file)["benchmarks"]
+    print_results(results, previous)
+
+    output = args.output or os.path.join(
+        RESULTS_DIRECTORY, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Пропускная способность записи SQLite для профилей PRAGMA из Config
+
+Запуск: python -m benchmarks.bench_sqlite_profiles
+Несколько конкурентных писателей делают короткие транзакции (как обработчики),
+параллельно читатель выполняет длинные выборки (как фоновые задачи).
+"""
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import config
+from database.database import get_sqlite_pragmas, apply_sqlite_pragmas
+from database.models import Base, User, Subscription
+
+WRITERS = 8
+TRANSACTIONS_PER_WRITER = 200
+
+
+async def writer(engine, user_id, errors):
+    for n in range(TRANSACTIONS_PER_WRITER):
+        try:
+            async with engine.begin() as connection:
+                await connection.execute(insert(Subscription).values(
+                    user_id=user_id, name=f"Подписка {n}", price=199, payment_day=10,
+                    next_payment_date=date.today()))
+        except OperationalError:
+            errors.append(n)
+
+
+async def reader(engine, stop):
+    while not stop.is_set():
+        async with engine.connect() as connection:
+            await connection.execute(select(func.sum(Subscription.price)))
+        await asyncio.sleep(0)
+
+
+async def run(profile):
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_async_engine(url, pool_size=WRITERS + 1, max_overflow=0)
+        apply_sqlite_pragmas(engine.sync_engine, get_sqlite_pragmas(profile, overrides=""))
+
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(User), [{"telegram_id": i} for i in range(WRITERS)])
+
+        errors = []
+        stop = asyncio.Event()
+        reader_task = asyncio.create_task(reader(engine, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(engine, user_id + 1, errors) for user_id in range(WRITERS)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await reader_task
+        await engine.dispose()
+
+    written = WRITERS * TRANSACTIONS_PER_WRITER - len(errors)
+    return written / elapsed, len(errors), elapsed
+
+
+async def main():
+    print(f"{'profile':>10} {'tx/s':>10} {'locked':>8} {'seconds':>8}")
+    for profile in config.SQLITE_PROFILES:
+        rate, errors, elapsed = await run(profile)
+        print(f"{profile:>10} {rate:>10.0f} {errors:>8} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Время холодного запуска main.py
+
+Запуск: python -m benchmarks.bench_startup [--runs 5]
+1. Импорт: python -X importtime -c "import main" - общее время и модули,
+   которые main импортирует напрямую, по убыванию накопленного времени.
+2. Время до первого апдейта: main.py запускается отдельным процессом против
+   benchmarks.fake_bot_api, в очереди getUpdates уже лежит /start. Замеряется
+   время от запуска процесса до первого getUpdates (бот готов) и до ответа на
+   /start. Варианты: новая база, существующая база с записанной версией схемы
+   и существующая база со сброшенной версией (полная проверка схемы).
+"""
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.load_test import ROOT, start_bot
+
+API_PORT = 18281
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+TOP_IMPORTS = 12
+
+
+# Время импорта main и его прямых зависимостей по -X importtime
+def measure_imports():
+    """Время импорта main и его прямых зависимостей по -X importtime, микросекунд"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, env=dict(os.environ, BOT_TOKEN="42:STARTUP"),
+                            capture_output=True, text=True, check=True)
+    total = 0
+    direct = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == "main":
+            total = cumulative
+        elif indent == 3:
+            # Отступ на уровень глубже main (у main - один пробел)
+            direct[name] = cumulative
+    return total, direct
+
+
+# Время от запуска процесса до готовности и до ответа на первый апдейт
+async def measure_first_update(directory):
+    """Время от запуска процесса до готовности и до ответа на первый апдейт, секунд"""
+    api = FakeBotAPI()
+    await api.start(port=API_PORT)
+    user_id = 1
+    waiter = api.wait_for_message(user_id)
+    api.push_update(api.make_message_update(user_id, "/start"))
+    started = time.perf_counter()
+    bot = start_bot(directory, API_PORT)
+    try:
+        while "getUpdates" not in api.calls:
+            if bot.poll() is not None:
+                raise RuntimeError(f"Бот не запустился, журнал: {directory}/bot.log")
+            await asyncio.sleep(0.005)
+        ready = time.perf_counter() - started
+        first_reply = await asyncio.wait_for(waiter, 60) - started
+    finally:
+        bot.send_signal(signal.SIGINT)
+        try:
+            bot.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        await api.stop()
+    return ready, first_reply
+
+
+def reset_schema_version(directory):
+    with sqlite3.connect(os.path.join(directory, "load.db")) as connection:
+        connection.execute("PRAGMA user_version = 0")
+
+
+async def main(runs):
+    print(f"Импорт main ({runs} запусков)")
+    imports = [measure_imports() for _ in range(runs)]
+    print(f"  всего: {statistics.median(total for total, _ in imports) / 1000:.0f} мс")
+    names = sorted(imports[0][1], key=lambda name: -imports[0][1][name])[:TOP_IMPORTS]
+    for name in names:
+        value = statistics.median(direct.get(name, 0) for _, direct in imports)
+        print(f"  {name:<40} {value / 1000:>8.1f} мс")
+
+    print(f"\nВремя до первого апдейта ({runs} запусков), секунд")
+    print(f"{'база':<34} {'готов':>8} {'ответ':>8}")
+    variants = {"новая": [], "версия схемы совпадает": [], "полная проверка схемы": []}
+    for _ in range(runs):
+        directory = tempfile.mkdtemp()
+        try:
+            variants["новая"].append(await measure_first_update(directory))
+            variants["версия схемы совпадает"].append(await measure_first_update(directory))
+            reset_schema_version(directory)
+            variants["полная проверка схемы"].append(await measure_first_update(directory))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    for name, timings in variants.items():
+        print(f"{name:<34} {statistics.median(ready for ready, _ in timings):>8.3f} "
+              f"{statistics.median(reply for _, reply in timings):>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args().runs))
@@ -0,0 +1,127 @@
+"""Задержка ответа бота в режимах polling и webhook
+
+Запуск: python -m benchmarks.bench_webhook
+Бот работает в этом же процессе с временной базой и обращается к локальной
+имитации Bot API (benchmarks.fake_bot_api). Задержка - от появления апдейта
+(в очереди getUpdates или POST на вебхук) до получения sendMessage с ответом.
+"""
+import os
+import tempfile
+
+DIRECTORY = tempfile.mkdtemp()
+os.environ["BOT_TOKEN"] = "42:BENCHMARK"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIRECTORY, 'bench.db')}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(DIRECTORY, 'bench.db')}"
+
+import asyncio  # noqa: E402
+import logging  # noqa: E402
+import time  # noqa: E402
+
+import aiohttp  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+
+from benchmarks.fake_bot_api import FakeBotAPI  # noqa: E402
+from config import config  # noqa: E402
+from database import init_database  # noqa: E402
+from database.database import db  # noqa: E402
+from main import create_bot, create_dispatcher  # noqa: E402
+from webhook import run_webhook  # noqa: E402
+
+API_PORT = 18081
+WEBHOOK_PORT = 18080
+SECRET = "benchmark-secret"
+COMMANDS = ["/start", "/help", "/upcoming"]
+SEQUENTIAL_UPDATES = 300
+CONCURRENT_UPDATES = 500
+
+config.TELEGRAM_API_URL = f"http://127.0.0.1:{API_PORT}"
+config.WEBHOOK_URL = f"http://127.0.0.1:{WEBHOOK_PORT}"
+config.WEBHOOK_HOST = "127.0.0.1"
+config.WEBHOOK_PORT = WEBHOOK_PORT
+config.WEBHOOK_SECRET = SECRET
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def measure(api, deliver):
+    """Последовательные апдейты (задержка) и пачка одновременных (пропускная способность)"""
+    latencies = []
+    for n in range(SEQUENTIAL_UPDATES):
+        user_id = 1000 + n % 50
+        waiter = api.wait_for_message(user_id)
+        started = time.perf_counter()
+        await deliver(api.make_message_update(user_id, COMMANDS[n % len(COMMANDS)]))
+        latencies.append(await waiter - started)
+
+    waiters = [api.wait_for_message(5000 + n) for n in range(CONCURRENT_UPDATES)]
+    started = time.perf_counter()
+    await asyncio.gather(*(deliver(api.make_message_update(5000 + n, "/help"))
+                           for n in range(CONCURRENT_UPDATES)))
+    await asyncio.gather(*waiters)
+    throughput = CONCURRENT_UPDATES / (time.perf_counter() - started)
+    return latencies, throughput
+
+
+async def run_polling(api, bot, dp):
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+    await asyncio.sleep(0.5)
+
+    async def deliver(update):
+        api.push_update(update)
+
+    try:
+        return await measure(api, deliver)
+    finally:
+        await dp.stop_polling()
+        await polling
+
+
+async def run_webhook_mode(api, bot, dp):
+    stop = asyncio.Event()
+    server = asyncio.create_task(run_webhook(bot, dp, stop))
+    await asyncio.sleep(0.5)
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}{config.WEBHOOK_PATH}"
+
+    async with aiohttp.ClientSession() as http:
+        async with http.post(url, json=api.make_message_update(1, "/help"),
+                             headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as response:
+            assert response.status == 401, f"неверный секрет принят: {response.status}"
+
+        async def deliver(update):
+            async with http.post(url, json=update,
+                                 headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                assert response.status == 200, response.status
+
+        try:
+            return await measure(api, deliver)
+        finally:
+            stop.set()
+            await server
+
+
+async def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    init_database()
+    api = FakeBotAPI()
+    await api.start(port=API_PORT)
+    # Один диспетчер на оба режима: роутер обработчиков подключается только один раз
+    bot = create_bot()
+    dp = create_dispatcher(MemoryStorage())
+    try:
+        print(f"{'mode':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'upd/s':>8}")
+        for mode, run in (("polling", run_polling), ("webhook", run_webhook_mode)):
+            latencies, throughput = await run(api, bot, dp)
+            print(f"{mode:>8} {percentile(latencies, 0.5) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.95) * 1000:>8.2f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f} {throughput:>8.0f}")
+    finally:
+        await bot.session.close()
+        await api.stop()
+        await db.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
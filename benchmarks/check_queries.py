@@ -0,0 +1,154 @@
+"""Проверка повторяющихся SQL-запросов (N+1) в обработчиках и задачах планировщика
+
+Запуск: python -m benchmarks.check_queries [--users 50] [--subscriptions 1000]
+Бот собирается как в main.py (create_bot, create_dispatcher) с QUERY_DEBUG=strict
+и временной базой из benchmarks.dataset, Bot API - benchmarks.fake_bot_api.
+Апдейты основных сценариев передаются в dp.feed_update, затем по разу
+выполняются задачи планировщика. Запрос, выполненный в апдейте или задаче
+больше QUERY_REPEAT_LIMIT раз (по умолчанию здесь 3), поднимает
+RepeatedQueryError; он, любая другая ошибка и апдейт без обработчика
+считаются провалом, и скрипт завершается с кодом 1. Подходит для CI.
+"""
+import os
+import tempfile
+
+WORK_DIRECTORY = tempfile.mkdtemp()
+WORK_DATABASE = os.path.join(WORK_DIRECTORY, "check.db")
+API_PORT = 18282
+os.environ.setdefault("BOT_TOKEN", "42:CHECK")
+os.environ.setdefault("QUERY_REPEAT_LIMIT", "3")
+os.environ["QUERY_DEBUG"] = "strict"
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DATABASE}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{WORK_DATABASE}"
+os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{API_PORT}"
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import logging  # noqa: E402
+import shutil  # noqa: E402
+import sqlite3  # noqa: E402
+import sys  # noqa: E402
+
+from aiogram.dispatcher.event.bases import UNHANDLED  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+from benchmarks.dataset import FIRST_TELEGRAM_ID, create_dataset  # noqa: E402
+from benchmarks.fake_bot_api import FakeBotAPI  # noqa: E402
+from config import config  # noqa: E402
+from database.database import db  # noqa: E402
+from database.fsm_storage import SqliteStorage  # noqa: E402
+from main import create_bot, create_dispatcher  # noqa: E402
+from scheduler import NotificationScheduler  # noqa: E402
+from sender import MessageSender  # noqa: E402
+
+NEW_USER_ID = 1
+
+
+# Шаги проверки: (название, функция, собирающая апдейт)
+def scenario(api, subscription_id):
+    """Шаги проверки: (название, функция, собирающая апдейт)
+
+    Апдейт собирается перед самим шагом, чтобы кнопки ссылались на последний ответ бота.
+    """
+    user = FIRST_TELEGRAM_ID
+    message = api.make_message_update
+
+    def callback(user_id, data):
+        return api.make_callback_update(user_id, data, api.last_reply[user_id]["message_id"])
+
+    return [
+        ("start", lambda: message(user, "/start")),
+        ("help", lambda: message(user, "/help")),
+        ("list", lambda: message(user, "/list")),
+        ("list_page", lambda: callback(user, "list_i")),
+        ("upcoming", lambda: message(user, "/upcoming")),
+        ("stats", lambda: message(user, "/stats")),
+        ("forecast", lambda: message(user, "/forecast")),
+        ("category", lambda: message(user, "/category")),
+        ("notify", lambda: message(user, "/notify")),
+        ("notify_days", lambda: callback(user, "notify_3")),
+        ("export", lambda: message(user, "/export json")),
+        ("edit_show", lambda: message(user, f"/edit {subscription_id}")),
+        ("edit_price", lambda: message(user, f"/edit {subscription_id} цена 349")),
+        ("delete", lambda: message(user, f"/delete {subscription_id}")),
+        ("new_start", lambda: message(NEW_USER_ID, "/start")),
+        ("add", lambda: message(NEW_USER_ID, "/add")),
+        ("add_name", lambda: message(NEW_USER_ID, "Netflix")),
+        ("add_price", lambda: message(NEW_USER_ID, "599")),
+        ("add_day", lambda: message(NEW_USER_ID, "15")),
+        ("add_period", lambda: callback(NEW_USER_ID, "period_monthly")),
+        ("add_category", lambda: callback(NEW_USER_ID, "category_1")),
+    ]
+
+
+async def run():
+    failures = []
+    api = FakeBotAPI()
+    await api.start(port=API_PORT)
+    bot = create_bot()
+    storage = SqliteStorage()
+    dp = create_dispatcher(storage)
+    try:
+        with sqlite3.connect(WORK_DATABASE) as connection:
+            subscription_id = connection.execute(
+                "SELECT s.id FROM subscriptions s JOIN users u ON u.id = s.user_id "
+                "WHERE u.telegram_id = ? ORDER BY s.id LIMIT 1",
+                (FIRST_TELEGRAM_ID,)).fetchone()[0]
+
+        for name, make_update in scenario(api, subscription_id):
+            update = Update.model_validate(make_update(), context={"bot": bot})
+            try:
+                result = await dp.feed_update(bot, update)
+                if result is UNHANDLED:
+                    failures.append((name, "апдейт не обработан"))
+            except Exception as e:
+                failures.append((name, f"{type(e).__name__}: {e}"))
+            # Состояния диалогов пишутся в фоне; следующий шаг должен видеть их в базе
+            await storage.flush()
+            print(f"{name:<28} {'ошибка' if failures and failures[-1][0] == name else 'ok'}")
+
+        # Напоминания запланированы на полночь, чтобы очередь была готова в любое время суток
+        config.NOTIFICATION_HOUR = 0
+        scheduler = NotificationScheduler(bot)
+        scheduler.sender = MessageSender(bot, rate=10 ** 9, chat_interval=0)
+        for job in (scheduler.send_daily_notifications, scheduler.update_payment_dates,
+                    scheduler.send_monthly_report):
+            try:
+                await job()
+            except Exception as e:
+                failures.append((job.__name__, f"{type(e).__name__}: {e}"))
+            print(f"{job.__name__:<28} "
+                  f"{'ошибка' if failures and failures[-1][0] == job.__name__ else 'ok'}")
+    finally:
+        await storage.close()
+        await bot.session.close()
+        await api.stop()
+        await db.async_engine.dispose()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--subscriptions", type=int, default=1000,
+                        help="подписок всего; у пользователя их должно быть больше лимита повторов")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        create_dataset(WORK_DATABASE, args.users, args.subscriptions)
+        db.init_db()
+        failures = asyncio.run(run())
+    finally:
+        shutil.rmtree(WORK_DIRECTORY, ignore_errors=True)
+
+    print(f"\nQUERY_DEBUG=strict, QUERY_REPEAT_LIMIT={config.QUERY_REPEAT_LIMIT}")
+    for name, error in failures:
+        print(f"ПРОВАЛ {name}: {error}")
+    if failures:
+        sys.exit(1)
+    print("Повторяющихся запросов не найдено")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Генератор синтетической базы пользователей и подписок для бенчмарков
+
+Запуск: python -m benchmarks.dataset [путь] [--users 100000] [--subscriptions 1000000]
+Распределения похожи на реальные: большинство подписок ежемесячные, дни
+платежа тяготеют к 1 и 15 числу и концу месяца, у пользователя в среднем
+subscriptions / users подписок (распределение Пуассона). Часть подписок
+приостановлена, часть просрочена (как после простоя планировщика), чтобы
+update_next_payment_dates было что обновлять. Агрегаты user_spending
+пересчитываются после вставки. Даты отсчитываются от дня генерации.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+
+from config import config
+from database.database import apply_sqlite_pragmas, get_sqlite_pragmas
+from database.models import Base, User, Subscription, Category
+from services import SubscriptionService, SpendingService
+
+DEFAULT_USERS = 100_000
+DEFAULT_SUBSCRIPTIONS = 1_000_000
+CHUNK_SIZE = 50_000
+FIRST_TELEGRAM_ID = 100_000_000
+
+PERIODS = ["monthly", "yearly", "weekly"]
+PERIOD_WEIGHTS = [0.72, 0.18, 0.10]
+NOTIFICATION_DAYS = [0, 1, 3, 7]
+NOTIFICATION_DAYS_WEIGHTS = [0.10, 0.30, 0.45, 0.15]
+# Веса категорий по умолчанию (в порядке DEFAULT_CATEGORIES), остальное - без категории
+CATEGORY_WEIGHTS = [0.24, 0.19, 0.10, 0.10, 0.12, 0.08, 0.05, 0.07]
+NO_CATEGORY_SHARE = 0.05
+MONTHLY_PRICES = [99, 149, 199, 249, 299, 399, 499, 599, 799, 999, 1490, 2990]
+YEARLY_PRICE_FACTOR = 10  # годовой тариф - примерно 10 месячных
+WEEKLY_PRICE_FACTOR = 0.25
+ACTIVE_SHARE = 0.88
+NOTIFICATIONS_SHARE = 0.92
+OVERDUE_SHARE = 0.03  # активные подписки с датой в прошлом
+NAMES = ["Netflix", "Кинопоиск", "Okko", "Spotify", "Яндекс Плюс", "VK Музыка", "YouTube Premium",
+         "Skyeng", "Coursera", "Duolingo", "PlayStation Plus", "Xbox Game Pass", "Steam",
+         "МТС", "Билайн", "Домашний интернет", "iCloud", "Google One", "Фитнес-клуб",
+         "Telegram Premium", "ChatGPT Plus", "Notion", "Литрес", "Storytel"]
+
+
+# Вероятности дней платежа 1..31
+def payment_day_weights():
+    """Вероятности дней платежа 1..31: пики на 1, 15 числе и в конце месяца"""
+    weights = np.full(31, 1.0)
+    weights[0] += 14.0
+    weights[14] += 4.0
+    weights[27:] += 1.5
+    return weights / weights.sum()
+
+
+# Сгенерировать строки пользователей
+def generate_users(users, rng):
+    """Сгенерировать строки пользователей"""
+    return [{"telegram_id": FIRST_TELEGRAM_ID + i, "notification_days": days,
+             "first_name": f"Пользователь {i}"}
+            for i, days in enumerate(rng.choice(NOTIFICATION_DAYS, size=users,
+                                                p=NOTIFICATION_DAYS_WEIGHTS).tolist())]
+
+
+# Сгенерировать строки подписок пачками по chunk_size
+def iter_subscription_chunks(users, subscriptions, category_ids, rng, today=None,
+                             chunk_size=CHUNK_SIZE):
+    """Сгенерировать строки подписок пачками по chunk_size (user_id - номер пользователя с 1)"""
+    today = today or date.today()
+    user_id = np.sort(rng.integers(1, users + 1, size=subscriptions))
+    period = rng.choice(len(PERIODS), size=subscriptions, p=PERIOD_WEIGHTS)
+    payment_day = rng.choice(np.arange(1, 32), size=subscriptions, p=payment_day_weights())
+    base_price = rng.choice(MONTHLY_PRICES, size=subscriptions).astype(np.float64)
+    price = np.where(period == 1, base_price * YEARLY_PRICE_FACTOR,
+                     np.where(period == 2, np.round(base_price * WEEKLY_PRICE_FACTOR), base_price))
+    category_weights = np.array(CATEGORY_WEIGHTS[:len(category_ids)]) * (1 - NO_CATEGORY_SHARE)
+    category_weights = np.append(category_weights, 1 - category_weights.sum())
+    category = rng.choice(list(category_ids) + [0], size=subscriptions, p=category_weights)
+    is_active = rng.random(subscriptions) < ACTIVE_SHARE
+    notifications = rng.random(subscriptions) < NOTIFICATIONS_SHARE
+    overdue = is_active & (rng.random(subscriptions) < OVERDUE_SHARE)
+    # Ежемесячные и ежегодные - в день платежа ближайшего месяца (ежегодные - еще до
+    # 11 месяцев вперед), еженедельные - в ближайшую неделю; просроченные - на 1-2 периода раньше
+    month_offset = np.where(period == 1, rng.integers(0, 12, size=subscriptions), 0)
+    week_offset = rng.integers(0, 7, size=subscriptions)
+    missed = rng.integers(1, 3, size=subscriptions)
+    created_days = rng.integers(0, 3 * 365, size=subscriptions)
+    name = rng.integers(0, len(NAMES), size=subscriptions)
+
+    first_dates = {day: SubscriptionService._calculate_next_payment_date(day)
+                   for day in range(1, 32)}
+    chunk = []
+    for n in range(subscriptions):
+        day = int(payment_day[n])
+        if period[n] == 2:
+            next_date = today + timedelta(days=int(week_offset[n]))
+            if overdue[n]:
+                next_date -= timedelta(weeks=int(missed[n]))
+        else:
+            months = int(month_offset[n])
+            if overdue[n]:
+                months -= int(missed[n]) if period[n] == 0 else 12
+            next_date = first_dates[day] if months == 0 \
+                else SubscriptionService._shift_months(first_dates[day], months, day)
+
+        chunk.append({
+            "user_id": int(user_id[n]),
+            "name": NAMES[name[n]],
+            "price": float(price[n]),
+            "payment_day": day,
+            "billing_period": PERIODS[period[n]],
+            "category_id": int(category[n]) or None,
+            "is_active": bool(is_active[n]),
+            "notifications_enabled": bool(notifications[n]),
+            "created_at": today - timedelta(days=int(created_days[n])),
+            "next_payment_date": next_date,
+        })
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Создать базу SQLite с синтетическими данными
+def create_dataset(path, users=DEFAULT_USERS, subscriptions=DEFAULT_SUBSCRIPTIONS, seed=0):
+    """Создать базу SQLite с синтетическими данными"""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    apply_sqlite_pragmas(engine, get_sqlite_pragmas())
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        connection.execute(insert(Category), [
+            {"name": category["name"], "emoji": category.get("emoji", ""), "is_default": True,
+             "created_at": datetime.now()}
+            for category in config.DEFAULT_CATEGORIES])
+        category_ids = connection.execute(select(Category.id).order_by(Category.id)).scalars().all()
+
+    rng = np.random.default_rng(seed)
+    user_rows = generate_users(users, rng)
+    with engine.begin() as connection:
+        for start in range(0, len(user_rows), CHUNK_SIZE):
+            connection.execute(insert(User), user_rows[start:start + CHUNK_SIZE])
+        for chunk in iter_subscription_chunks(users, subscriptions, category_ids, rng):
+            connection.execute(insert(Subscription), chunk)
+        for statement in SpendingService.rebuild_statements():
+            connection.execute(statement)
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+
+# Путь к базе с синтетическими данными (создается при первом обращении за день)
+def dataset_path(users=DEFAULT_USERS, subscriptions=DEFAULT_SUBSCRIPTIONS, seed=0, directory=None):
+    """Путь к базе с синтетическими данными (создается при первом обращении за день)
+
+    Даты подписок отсчитываются от дня генерации, поэтому в имени файла есть дата.
+    """
+    directory = directory or tempfile.gettempdir()
+    path = os.path.join(directory, f"subscriptions_{users}_{subscriptions}_{seed}_"
+                                   f"{date.today():%Y%m%d}.db")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        print(f"Генерация {users} пользователей и {subscriptions} подписок в {path}...")
+        create_dataset(path + ".tmp", users, subscriptions, seed)
+        os.replace(path + ".tmp", path)
+        print(f"Готово за {time.perf_counter() - started:.1f} с")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", help="файл базы (по умолчанию - во временном каталоге)")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--subscriptions", type=int, default=DEFAULT_SUBSCRIPTIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.path:
+        started = time.perf_counter()
+        create_dataset(args.path, args.users, args.subscriptions, args.seed)
+        print(f"{args.path}: готово за {time.perf_counter() - started:.1f} с")
+    else:
+        print(dataset_path(args.users, args.subscriptions, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Локальная имитация Bot API для бенчмарков
+
+Запуск отдельно: python -m benchmarks.fake_bot_api [--port 8081] [--latency 0.05]
+                                                [--rate-limit 0.01]
+Бот подключается к ней через TELEGRAM_API_URL=http://127.0.0.1:<порт>.
+Поддерживаются getMe, getUpdates (long polling), sendMessage, editMessageText,
+editMessageReplyMarkup и answerCallbackQuery; остальные методы (setWebhook,
+deleteWebhook...) отвечают true. Ответы бота сохраняются с временем получения,
+апдейты добавляются через push_update.
+
+latency - задержка ответа на каждый метод, кроме getUpdates, секунд;
+rate_limit - доля ответов 429 с retry_after на методы отправки сообщений.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from aiohttp import web
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Бенчмарк", "username": "bench_bot"}
+# Методы, которыми бот отвечает пользователю: на них ждут wait_for_message и приходят 429
+REPLY_METHODS = {"sendmessage", "editmessagetext", "editmessagereplymarkup"}
+RATE_LIMITED_METHODS = REPLY_METHODS | {"answercallbackquery"}
+
+
+class FakeBotAPI:
+    """Сервер, отвечающий боту как Bot API"""
+
+    def __init__(self, latency=0.0, rate_limit=0.0, retry_after=1, seed=0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.updates = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.new_update = asyncio.Event()
+        self.sent = []  # (время получения, chat_id, метод, параметры)
+        self.last_reply = {}  # chat_id -> параметры последнего ответа (с message_id)
+        self.waiters = {}  # chat_id -> список [сколько ответов осталось, future]
+        self.calls = {}
+        self.rate_limited = 0
+        self.webhook_url = ""  # пока вебхук задан, getUpdates отвечает 409, как Bot API
+        self.runner = None
+
+    # Запустить сервер
+    async def start(self, host="127.0.0.1", port=8081):
+        """Запустить сервер"""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host=host, port=port).start()
+
+    # Остановить сервер
+    async def stop(self):
+        """Остановить сервер"""
+        if self.runner:
+            await self.runner.cleanup()
+
+    # Собрать апдейт с текстовым сообщением пользователя
+    def make_message_update(self, user_id, text):
+        """Собрать апдейт с текстовым сообщением пользователя"""
+        update_id = next(self.update_ids)
+        return {"update_id": update_id,
+                "message": {"message_id": update_id, "date": int(time.time()),
+                            "chat": {"id": user_id, "type": "private"},
+                            "from": {"id": user_id, "is_bot": False, "first_name": "Пользователь"},
+                            "text": text}}
+
+    # Собрать апдейт с нажатием inline-кнопки под сообщением бота
+    def make_callback_update(self, user_id, data, message_id):
+        """Собрать апдейт с нажатием inline-кнопки под сообщением бота"""
+        update_id = next(self.update_ids)
+        return {"update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id), "chat_instance": str(user_id), "data": data,
+                    "from": {"id": user_id, "is_bot": False, "first_name": "Пользователь"},
+                    "message": {"message_id": message_id, "date": int(time.time()),
+                                "chat": {"id": user_id, "type": "private"},
+                                "from": BOT_USER, "text": "..."}}}
+
+    # Поставить апдейт в очередь getUpdates
+    def push_update(self, update):
+        """Поставить апдейт в очередь getUpdates
+
+        update_id выдается заново: getUpdates подтверждает все апдейты до offset,
+        поэтому очередь должна быть упорядочена по времени добавления.
+        """
+        update["update_id"] = next(self.update_ids)
+        self.updates.append(update)
+        self.new_update.set()
+
+    # Дождаться следующих ответов бота в чат
+    def wait_for_message(self, chat_id, count=1):
+        """Дождаться count следующих ответов бота в чат (future со временем последнего)
+
+        Ответом считаются sendMessage, editMessageText и editMessageReplyMarkup.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(chat_id, []).append([count, future])
+        return future
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = dict(await request.post()) if request.can_read_body else {}
+        self.calls[method] = self.calls.get(method, 0) + 1
+        name = method.lower()
+        if self.latency and name != "getupdates":
+            await asyncio.sleep(self.latency)
+        if name in RATE_LIMITED_METHODS and self.random.random() < self.rate_limit:
+            self.rate_limited += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429,
+                 "description": f"Too Many Requests: retry after {self.retry_after}",
+                 "parameters": {"retry_after": self.retry_after}}, status=429)
+
+        if name == "getupdates" and self.webhook_url:
+            return web.json_response(
+                {"ok": False, "error_code": 409,
+                 "description": "Conflict: can't use getUpdates method while webhook is active; "
+                                "use deleteWebhook to delete the webhook first"}, status=409)
+
+        handler = getattr(self, f"api_{name}", None)
+        result = await handler(params) if handler else True
+        if name in REPLY_METHODS:
+            params.setdefault("message_id", result["message_id"])
+            self._record(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    def _record(self, method, params):
+        received_at = time.perf_counter()
+        chat_id = int(params["chat_id"])
+        self.sent.append((received_at, chat_id, method, params))
+        self.last_reply[chat_id] = params
+        waiters = self.waiters.get(chat_id, [])
+        for waiter in waiters:
+            waiter[0] -= 1
+            if waiter[0] <= 0 and not waiter[1].done():
+                waiter[1].set_result(received_at)
+        self.waiters[chat_id] = [waiter for waiter in waiters if waiter[0] > 0]
+
+    async def api_getme(self, params):
+        return BOT_USER
+
+    async def api_setwebhook(self, params):
+        self.webhook_url = params.get("url", "")
+        return True
+
+    async def api_deletewebhook(self, params):
+        self.webhook_url = ""
+        return True
+
+    async def api_getupdates(self, params):
+        offset = int(params.get("offset") or 0)
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates:
+            self.new_update.clear()
+            try:
+                await asyncio.wait_for(self.new_update.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self.updates[:limit]
+
+    async def api_sendmessage(self, params):
+        chat_id = int(params["chat_id"])
+        return {"message_id": next(self.message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER,
+                "text": params.get("text", "")}
+
+    async def api_senddocument(self, params):
+        chat_id = int(params["chat_id"])
+        return {"message_id": next(self.message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER,
+                "document": {"file_id": "document", "file_unique_id": "document"}}
+
+    async def api_editmessagetext(self, params):
+        chat_id = int(params["chat_id"])
+        return {"message_id": int(params["message_id"]), "date": int(time.time()),
+                "edit_date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER, "text": params.get("text", "")}
+
+    async def api_editmessagereplymarkup(self, params):
+        chat_id = int(params["chat_id"])
+        return {"message_id": int(params["message_id"]), "date": int(time.time()),
+                "edit_date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER, "text": "..."}
+
+
+async def serve(port, latency, rate_limit):
+    api = FakeBotAPI(latency=latency, rate_limit=rate_limit)
+    await api.start(port=port)
+    print(f"Bot API слушает http://127.0.0.1:{port}")
+    while True:
+        await asyncio.sleep(10)
+        print(json.dumps(api.calls, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, секунд")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля ответов 429")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.latency, args.rate_limit))
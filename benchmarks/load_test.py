@@ -0,0 +1,215 @@
+"""Нагрузочный тест бота через локальную имитацию Bot API
+
+Запуск: python -m benchmarks.load_test [--users 1000] [--mode polling|webhook]
+                                       [--latency 0.05] [--rate-limit 0.01]
+Бот запускается отдельным процессом (python main.py) с временной базой и
+TELEGRAM_API_URL, указывающим на benchmarks.fake_bot_api. Каждый синтетический
+пользователь одновременно с остальными проходит сценарий: /start, добавление
+подписки через /add с выбором периода и категории кнопками, /list, просмотр и
+изменение подписки через /edit. Задержка шага - от отправки апдейта до
+последнего ожидаемого ответа бота. Шаг без ответа за --timeout секунд
+(например, после 429) считается ошибкой, и сценарий пользователя прерывается.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.fake_bot_api import FakeBotAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_USER_ID = 500_000_000
+CATEGORY_IDS = range(1, 9)  # категории по умолчанию в новой базе
+SECRET = "load-test-secret"
+SUBSCRIPTION_ID = re.compile(r"ID: `(\d+)`")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class LoadTest:
+    """Сценарии пользователей и сбор задержек"""
+
+    def __init__(self, api, deliver, timeout, think_time):
+        self.api = api
+        self.deliver = deliver
+        self.timeout = timeout
+        self.think_time = think_time
+        self.latencies = {}  # шаг -> список задержек, секунд
+        self.failures = {}  # шаг -> число шагов без ответа
+        self.updates = 0
+
+    # Отправить апдейт и дождаться ответов бота
+    async def step(self, rnd, name, user_id, update, responses=1):
+        """Отправить апдейт и дождаться responses ответов бота; False при таймауте
+
+        Перед отправкой выдерживается пауза «на размышление»: обработчик
+        меняет состояние диалога уже после ответа, и мгновенный следующий шаг
+        застал бы старое состояние.
+        """
+        await asyncio.sleep(rnd.uniform(0.5, 1.5) * self.think_time)
+        waiter = self.api.wait_for_message(user_id, responses)
+        started = time.perf_counter()
+        self.updates += 1
+        await self.deliver(update)
+        try:
+            answered_at = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self.failures[name] = self.failures.get(name, 0) + 1
+            return False
+        self.latencies.setdefault(name, []).append(answered_at - started)
+        return True
+
+    # Сценарий одного пользователя
+    async def run_user(self, user_id, rnd):
+        """Сценарий одного пользователя"""
+        api = self.api
+        message = api.make_message_update
+        for name, text in (("start", "/start"),
+                           ("add", "/add"),
+                           ("add_name", f"Подписка {rnd.randrange(1000)}"),
+                           ("add_price", str(rnd.choice([199, 299, 599]))),
+                           ("add_day", str(rnd.randint(1, 31)))):
+            if not await self.step(rnd, name, user_id, message(user_id, text)):
+                return
+
+        # Кнопки под сообщением с выбором периода; обработчики меняют сообщение двумя
+        # запросами и отвечают на выбор категории отдельным сообщением
+        message_id = int(api.last_reply[user_id]["message_id"])
+        period = rnd.choice(["monthly", "yearly", "weekly"])
+        category = rnd.choice(CATEGORY_IDS)
+        for name, data in (("add_period", f"period_{period}"),
+                           ("add_category", f"category_{category}")):
+            if not await self.step(rnd, name, user_id,
+                                   api.make_callback_update(user_id, data, message_id), 2):
+                return
+
+        if not await self.step(rnd, "list", user_id, message(user_id, "/list")):
+            return
+        match = SUBSCRIPTION_ID.search(api.last_reply[user_id].get("text", ""))
+        if not match:
+            self.failures["list"] = self.failures.get("list", 0) + 1
+            return
+
+        subscription_id = match.group(1)
+        if await self.step(rnd, "edit_show", user_id, message(user_id, f"/edit {subscription_id}")):
+            await self.step(rnd, "edit_price", user_id, message(
+                user_id, f"/edit {subscription_id} цена {rnd.choice([249, 349, 699])}"))
+
+    async def run(self, users, ramp_up):
+        rnd = random.Random(0)
+        started = time.perf_counter()
+
+        async def delayed(index):
+            await asyncio.sleep(ramp_up * index / users)
+            await self.run_user(FIRST_USER_ID + index, random.Random(rnd.random()))
+
+        await asyncio.gather(*(delayed(index) for index in range(users)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        print(f"{'step':<14} {'count':>7} {'failed':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        everything = []
+        for name in list(self.latencies) + [name for name in self.failures
+                                            if name not in self.latencies]:
+            values = self.latencies.get(name, [])
+            everything.extend(values)
+            print(f"{name:<14} {len(values):>7} {self.failures.get(name, 0):>7} " + (
+                f"{percentile(values, 0.5) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f} "
+                f"{percentile(values, 0.99) * 1000:>8.1f}" if values else ""))
+        if everything:
+            print(f"{'all':<14} {len(everything):>7} {sum(self.failures.values()):>7} "
+                  f"{percentile(everything, 0.5) * 1000:>8.1f} "
+                  f"{percentile(everything, 0.95) * 1000:>8.1f} "
+                  f"{percentile(everything, 0.99) * 1000:>8.1f}")
+        print(f"\n{self.updates} апдейтов за {elapsed:.1f} с: {self.updates / elapsed:.0f} upd/s, "
+              f"ответов 429: {self.api.rate_limited}")
+
+
+# Запустить main.py с базой в directory и имитацией Bot API
+def start_bot(directory, api_port, mode="polling", webhook_port=18180):
+    """Запустить main.py с базой в directory и имитацией Bot API"""
+    database = os.path.join(directory, "load.db")
+    env = dict(os.environ,
+               BOT_TOKEN="42:LOADTEST",
+               TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}",
+               DATABASE_URL=f"sqlite:///{database}",
+               ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{database}",
+               BOT_MODE=mode,
+               METRICS_PORT="0",
+               WEBHOOK_URL=f"http://127.0.0.1:{webhook_port}",
+               WEBHOOK_HOST="127.0.0.1",
+               WEBHOOK_PORT=str(webhook_port),
+               WEBHOOK_SECRET=SECRET)
+    log = open(os.path.join(directory, "bot.log"), "w")
+    return subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env, stdout=log,
+                            stderr=subprocess.STDOUT)
+
+
+async def main(args):
+    directory = tempfile.mkdtemp()
+    api = FakeBotAPI(latency=args.latency, rate_limit=args.rate_limit)
+    await api.start(port=args.api_port)
+    bot = start_bot(directory, args.api_port, args.mode, args.webhook_port)
+    http = aiohttp.ClientSession()
+    try:
+        # Бот готов, когда начал опрашивать getUpdates или зарегистрировал вебхук
+        ready_call = "setWebhook" if args.mode == "webhook" else "getUpdates"
+        deadline = time.monotonic() + 30
+        while ready_call not in api.calls:
+            if bot.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"Бот не запустился, журнал: {directory}/bot.log")
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.5)
+
+        if args.mode == "webhook":
+            url = f"http://127.0.0.1:{args.webhook_port}/webhook"
+
+            async def deliver(update):
+                async with http.post(url, json=update,
+                                     headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}):
+                    pass
+        else:
+            async def deliver(update):
+                api.push_update(update)
+
+        test = LoadTest(api, deliver, args.timeout, args.think_time)
+        print(f"{args.users} пользователей, режим {args.mode}, задержка Bot API "
+              f"{args.latency * 1000:.0f} мс, доля 429: {args.rate_limit:.1%}\n")
+        elapsed = await test.run(args.users, args.ramp_up)
+        test.report(elapsed)
+    finally:
+        await http.close()
+        bot.send_signal(signal.SIGINT)
+        try:
+            bot.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        await api.stop()
+        print(f"Журнал бота: {directory}/bot.log")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--mode", choices=["polling", "webhook"], default="polling")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка Bot API, секунд")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--ramp-up", type=float, default=5.0,
+                        help="за сколько секунд подключаются все пользователи")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="средняя пауза пользователя между шагами, секунд")
+    parser.add_argument("--timeout", type=float, default=30.0, help="ожидание ответа на шаг")
+    parser.add_argument("--api-port", type=int, default=18181)
+    parser.add_argument("--webhook-port", type=int, default=18180)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,151 @@
+from collections import namedtuple, OrderedDict
+from datetime import date
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+from config import config
+from database.models import Category
+from keyboards import get_categories_keyboard
+
+CachedCategory = namedtuple("CachedCategory", ["id", "name", "emoji"])
+
+
+class CategoryCache:
+    """Справочник категорий в памяти процесса
+
+    Категории почти не меняются, поэтому список, имена по id и готовая
+    клавиатура выбора строятся один раз. После изменения категорий нужно
+    вызвать invalidate(): следующее обращение перечитает их из БД.
+    """
+
+    def __init__(self):
+        self.categories = []
+        self.names = {}
+        self.keyboard = None
+        self.loaded = False
+
+    # Заполнить кэш списком категорий
+    def load(self, categories):
+        """Заполнить кэш списком категорий"""
+        self.categories = [CachedCategory(category.id, category.name, category.emoji)
+                           for category in categories]
+        self.names = {category.id: category.name for category in self.categories}
+        self.keyboard = get_categories_keyboard(self.categories)
+        self.loaded = True
+
+    # Сбросить кэш
+    def invalidate(self):
+        """Сбросить кэш"""
+        self.loaded = False
+
+    # Загрузить категории, если кэш пуст или сброшен
+    async def ensure_loaded(self, session):
+        """Загрузить категории, если кэш пуст или сброшен"""
+        if not self.loaded:
+            result = await session.execute(select(Category).order_by(Category.name))
+            self.load(result.scalars().all())
+
+    # Получить все категории
+    async def get_categories(self, session):
+        """Получить все категории"""
+        await self.ensure_loaded(session)
+        return self.categories
+
+    # Получить клавиатуру выбора категории
+    async def get_keyboard(self, session):
+        """Получить клавиатуру выбора категории"""
+        await self.ensure_loaded(session)
+        return self.keyboard
+
+    # Получить название категории по id
+    async def get_name(self, session, category_id, default="Без категории"):
+        """Получить название категории по id"""
+        await self.ensure_loaded(session)
+        return self.names.get(category_id, default)
+
+
+category_cache = CategoryCache()
+
+
+class RenderCache:
+    """Готовые ответы обработчиков по пользователям (LRU)
+
+    Запись хранится для telegram_id вместе с датой, на которую она построена,
+    поэтому после полуночи старые ответы не выдаются. Изменяющие подписки методы
+    сервиса отмечают пользователя через mark_changed(), а записи сбрасываются
+    после commit сессии. Ответ, построенный до сброса, в кэш не попадает:
+    put() сравнивает поколение с тем, что было получено до чтения из БД.
+    """
+
+    def __init__(self, max_users=config.RENDER_CACHE_SIZE):
+        self.max_users = max_users
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    # Получить готовый ответ или None
+    def get(self, telegram_id, view):
+        """Получить готовый ответ или None"""
+        entry = self.entries.get(telegram_id)
+        if entry is None or entry[0] != date.today() or view not in entry[1]:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(telegram_id)
+        self.hits += 1
+        return entry[1][view]
+
+    # Сохранить ответ, если данные не менялись с момента generation
+    def put(self, telegram_id, view, payload, generation):
+        """Сохранить ответ, если данные не менялись с момента generation"""
+        if generation != self.generation:
+            return
+
+        today = date.today()
+        entry = self.entries.get(telegram_id)
+        if entry is None or entry[0] != today:
+            entry = (today, {})
+            self.entries[telegram_id] = entry
+        entry[1][view] = payload
+        self.entries.move_to_end(telegram_id)
+
+        while len(self.entries) > self.max_users:
+            self.entries.popitem(last=False)
+
+    # Сбросить ответы пользователя
+    def invalidate(self, telegram_id):
+        """Сбросить ответы пользователя"""
+        self.generation += 1
+        self.entries.pop(telegram_id, None)
+
+    # Сбросить все ответы
+    def clear(self):
+        """Сбросить все ответы"""
+        self.generation += 1
+        self.entries.clear()
+
+    # Отметить, что данные пользователя изменены в этой сессии
+    @staticmethod
+    def mark_changed(session, telegram_id):
+        """Отметить, что данные пользователя изменены в этой сессии"""
+        session.info.setdefault("changed_users", set()).add(telegram_id)
+
+    def stats(self):
+        """Размер кэша и счетчики попаданий"""
+        total = self.hits + self.misses
+        return {"users": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+render_cache = RenderCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for telegram_id in session.info.pop("changed_users", ()):
+        render_cache.invalidate(telegram_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("changed_users", None)
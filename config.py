@@ -6,9 +6,80 @@ load_dotenv()
 
 class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
-    DATABASE_URL = "sqlite:///database/subscriptions.db"
+
+    # Получение апдейтов: "polling" (getUpdates) или "webhook" (HTTP-сервер aiohttp)
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")  # свой сервер Bot API, например http://localhost:8081
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный адрес бота, например https://bot.example.com
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")  # адрес, на котором слушает сервер
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # пустой - генерируется при запуске
+    WEBHOOK_DRAIN_TIMEOUT = 30  # сколько ждать обработки принятых апдейтов при остановке, секунд
+
+    # Администраторы (через запятую): им доступна команда /metrics
+    ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+    # Локальный HTTP-эндпоинт метрик для Prometheus, 0 - отключен (по умолчанию)
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+    # Отладка запросов для разработки и CI: "off", "log" - писать медленные и
+    # повторяющиеся запросы в журнал, "strict" - еще и поднимать RepeatedQueryError
+    QUERY_DEBUG = os.getenv("QUERY_DEBUG", "off")
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))  # порог медленного запроса
+    QUERY_REPEAT_LIMIT = int(os.getenv("QUERY_REPEAT_LIMIT", "10"))  # повторов одного запроса на апдейт
+
+    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database/subscriptions.db")
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "sqlite+aiosqlite:///database/subscriptions.db")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+    # Профиль PRAGMA для SQLite, применяется к каждому новому соединению.
+    # SQLITE_PRAGMAS дополняет профиль: "cache_size=-64000,mmap_size=0"
+    SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "wal")
+    SQLITE_PRAGMAS = os.getenv("SQLITE_PRAGMAS", "")
+    SQLITE_PROFILES = {
+        # Настройки SQLite по умолчанию: журнал отката, synchronous=FULL
+        "default": {},
+        # WAL: читатели не блокируют писателя, fsync только на контрольных точках
+        "wal": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "mmap_size": 128 * 1024 * 1024,
+            "cache_size": -20000,  # в КиБ
+            "temp_store": "MEMORY",
+        },
+        # WAL с fsync на каждый commit
+        "durable": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "busy_timeout": 5000,
+        },
+    }
+
+    # Хранилище состояний диалогов (FSM)
+    FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 60 * 60)))  # секунд без изменений до удаления
+    FSM_SWEEP_INTERVAL = 10 * 60  # период удаления устаревших состояний, секунд
+    FSM_CACHE_SIZE = 10000  # состояний в кэше в памяти
 
     NOTIFICATION_HOUR = 15  # во сколько будут отправляться уведомления (24-часовой формат)
+    NOTIFICATION_MAX_AGE_HOURS = 24  # неотправленные напоминания старше этого не досылаются
+
+    # Параметры рассылки (лимит Bot API - около 30 сообщений в секунду)
+    SEND_RATE_LIMIT = 28  # сообщений в секунду на всех пользователей
+    SEND_CHAT_INTERVAL = 1.0  # минимальный интервал между сообщениями в один чат, секунд
+    SEND_CONCURRENCY = 16  # одновременных запросов к Bot API
+    SEND_MAX_RETRIES = 5  # повторов при сетевых ошибках и RetryAfter
+    OUTBOX_BATCH_USERS = 200  # пользователей в одной пачке отправки напоминаний
+    REPORT_BATCH_SIZE = 1000  # отчетов в одной пачке ежемесячной рассылки
+    MESSAGE_MAX_LENGTH = 4096  # максимальная длина сообщения в Telegram
+    LIST_PAGE_SIZE = 10  # подписок на одной странице /list
+    IMPORT_MAX_BYTES = 20 * 1024 * 1024  # лимит Bot API на скачивание файла
+    IMPORT_MAX_ROWS = 10000  # подписок в одном файле импорта
+    IMPORT_CHUNK_SIZE = 500  # строк в одном пакетном INSERT
+    FORECAST_MAX_MONTHS = 24  # максимальный горизонт /forecast, месяцев
+    RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "10000"))  # пользователей в кэше ответов
 
     # Категории по умолчанию
     DEFAULT_CATEGORIES = [
@@ -1,3 +1,3 @@
 """Определение модуля для работы с БД"""
-from .database import Database, init_database, get_db
-from .models import User, Subscription, Notification, Category
+from .database import Database, init_database, get_db, get_async_db
+from .models import User, Subscription, Notification, Category, UserSpending, CategorySpending
@@ -1,35 +1,193 @@
-from sqlalchemy import create_engine
+import zlib
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import cached_property
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.exc import SQLAlchemyError
 from config import config
-from database.models import Base, Category
+from database.instrumentation import instrument_engine
+from database.models import Base, Category, UserSpending
+
+# Сессия текущего апдейта или задачи: у каждой asyncio-задачи своя копия контекста,
+# поэтому конкурентные корутины на одном потоке не делят сессию
+current_session: ContextVar = ContextVar("current_session", default=None)
+
+
+def get_sqlite_pragmas(profile=None, overrides=None) -> dict:
+    """PRAGMA выбранного профиля с учетом переопределений из окружения"""
+    profile = profile or config.SQLITE_PROFILE
+    if profile not in config.SQLITE_PROFILES:
+        raise ValueError(f"Неизвестный профиль SQLite: {profile}")
+
+    pragmas = dict(config.SQLITE_PROFILES[profile])
+    overrides = config.SQLITE_PRAGMAS if overrides is None else overrides
+    for item in filter(None, (part.strip() for part in overrides.split(","))):
+        name, _, value = item.partition("=")
+        pragmas[name.strip()] = value.strip()
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas) -> None:
+    """Выполнять PRAGMA при открытии каждого соединения SQLite"""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    event.listen(engine, "connect", on_connect)
+
+
+def _pool_options(url) -> dict:
+    """Размер пула не задается для SQLite в памяти: там один общий коннект"""
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}
+    return {"pool_size": config.DB_POOL_SIZE, "max_overflow": config.DB_MAX_OVERFLOW}
+
+
+def schema_version(metadata=Base.metadata) -> int:
+    """Отпечаток схемы моделей: таблицы, колонки и индексы
+
+    Хранится в PRAGMA user_version; пока он совпадает, init_db не сверяет схему.
+    """
+    parts = []
+    for table in metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{column.name}:{column.type}:{column.nullable}:{column.primary_key}"
+                     for column in table.columns)
+        parts.extend(f"{index.name}:{[column.name for column in index.columns]}:{index.unique}"
+                     for index in sorted(table.indexes, key=lambda index: index.name))
+    # user_version - знаковое 32-битное число, 0 означает "версия не записана"
+    return zlib.crc32("\n".join(parts).encode()) & 0x7FFFFFFF or 1
 
 
 class Database:
+    """Движки и фабрики сессий создаются при первом обращении, а не при импорте"""
+
     def __init__(self) -> None:
         self.database_url: str = config.DATABASE_URL
-        self.engine = create_engine(self.database_url, connect_args={"check_same_thread": False},
-                                    echo=False, pool_pre_ping=True)
-        self.SessionLocal = scoped_session(
-            sessionmaker(autocommit=False, autoflush=False, bind=self.engine))
+        # Асинхронный движок для обработчиков и задач планировщика
+        self.async_database_url: str = config.ASYNC_DATABASE_URL
+
+        # Счетчики пула: рост in_use без нагрузки означает утечку сессий
+        self.pool_checkouts = 0
+        self.pool_in_use = 0
+
+    @cached_property
+    def engine(self):
+        engine = create_engine(self.database_url, connect_args={"check_same_thread": False},
+                               echo=False, pool_pre_ping=True, **_pool_options(self.database_url))
+        apply_sqlite_pragmas(engine, get_sqlite_pragmas())
+        instrument_engine(engine)
+        return engine
+
+    @cached_property
+    def SessionLocal(self):
+        return scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=self.engine))
+
+    @cached_property
+    def async_engine(self):
+        async_engine = create_async_engine(self.async_database_url, echo=False, pool_pre_ping=True,
+                                           **_pool_options(self.async_database_url))
+        apply_sqlite_pragmas(async_engine.sync_engine, get_sqlite_pragmas())
+        event.listen(async_engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(async_engine.sync_engine, "checkin", self._on_checkin)
+        instrument_engine(async_engine.sync_engine)
+        return async_engine
+
+    @cached_property
+    def AsyncSessionLocal(self):
+        return async_sessionmaker(bind=self.async_engine, autoflush=False, expire_on_commit=False)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.pool_checkouts += 1
+        self.pool_in_use += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self.pool_in_use -= 1
+
+    def pool_status(self) -> dict:
+        """Состояние пула асинхронного движка"""
+        pool = self.async_engine.sync_engine.pool
+        return {
+            "size": pool.size() if hasattr(pool, "size") else 0,
+            "max_overflow": max(getattr(pool, "_max_overflow", 0), 0),
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else self.pool_in_use,
+            "in_use": self.pool_in_use,
+            "checkouts_total": self.pool_checkouts,
+        }
 
     def init_db(self) -> None:
-        """Инициализация базы данных - создание всех таблиц"""
+        """Инициализация базы данных - создание всех таблиц
+
+        Если записанная версия схемы совпадает с текущими моделями, таблицы,
+        индексы и категории уже на месте: проверка пропускается, а кэш
+        категорий заполнится при первом обращении.
+        """
+        version = schema_version()
+        if self.stored_schema_version() == version:
+            print("Схема базы данных не изменилась")
+            return
+
         try:
+            has_spending = inspect(self.engine).has_table(UserSpending.__tablename__)
             Base.metadata.create_all(bind=self.engine)
+            # create_all не добавляет новые индексы в уже существующие таблицы
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=self.engine, checkfirst=True)
             print("База данных инициализирована")
-            self._create_default_categories()
+            if not has_spending:
+                self._rebuild_spending()
+            if self._create_default_categories():
+                self._store_schema_version(version)
         except SQLAlchemyError as e:
             print(f"Ошибка при инициализации базы данных: {e}")
             raise
 
-    def _create_default_categories(self) -> None:
-        """Создание категорий по умолчанию"""
+    def stored_schema_version(self):
+        """Версия схемы из PRAGMA user_version (None не для SQLite)"""
+        if self.engine.dialect.name != "sqlite":
+            return None
+        with self.engine.connect() as connection:
+            return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+    def _store_schema_version(self, version) -> None:
+        if self.engine.dialect.name == "sqlite":
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+    def _rebuild_spending(self) -> None:
+        """Заполнение агрегатов расходов для базы, созданной до их появления"""
+        from services import SpendingService
+
         session = self.SessionLocal()
         try:
-            existing_categories = session.query(Category).all()
+            for statement in SpendingService.rebuild_statements():
+                session.execute(statement)
+            session.commit()
+            print("Агрегаты расходов пересчитаны")
+        finally:
+            session.close()
+
+    def _create_default_categories(self) -> bool:
+        """Создание категорий по умолчанию и прогрев кэша категорий"""
+        from cache import category_cache
+
+        session = self.SessionLocal()
+        try:
+            existing_categories = session.query(Category).order_by(Category.name).all()
             if existing_categories:
-                return
+                category_cache.load(existing_categories)
+                return True
 
             for cat_data in config.DEFAULT_CATEGORIES:
                 category = Category(
@@ -41,9 +199,12 @@ class Database:
 
             session.commit()
             print("Категории по умолчанию созданы")
+            category_cache.load(session.query(Category).order_by(Category.name).all())
+            return True
         except SQLAlchemyError as e:
             session.rollback()
             print(f"Ошибка при создании категорий: {e}")
+            return False
         finally:
             session.close()
 
@@ -51,6 +212,10 @@ class Database:
         """Получение сессии базы данных"""
         return self.SessionLocal()
 
+    def get_async_session(self):
+        """Получение асинхронной сессии базы данных"""
+        return self.AsyncSessionLocal()
+
 
 db = Database()
 
@@ -67,3 +232,15 @@ def get_db():
         yield session
     finally:
         session.close()
+
+
+@asynccontextmanager
+async def get_async_db():
+    """Асинхронная сессия для задач планировщика и скриптов"""
+    session = db.get_async_session()
+    token = current_session.set(session)
+    try:
+        yield session
+    finally:
+        current_session.reset(token)
+        await session.close()
@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from collections import OrderedDict
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import config
+from database.database import db, current_session
+from database.models import FsmState
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteStorage(BaseStorage):
+    """Хранилище состояний FSM в таблице fsm_states
+
+    Перед таблицей стоит LRU-кэш на cache_size ключей. Запись сразу попадает
+    в кэш, а в БД ее переносит фоновая задача короткими отдельными
+    транзакциями (несколько изменений одного ключа сливаются в одно). Так
+    состояние не ждет блокировку записи SQLite и не держит ее на время
+    обработчика, а следующий апдейт пользователя сразу видит новое состояние.
+    Неотправленные записи сохраняются в close(). Состояния без изменений
+    дольше ttl секунд считаются пустыми и удаляются периодической очисткой
+    (start_sweeper).
+    """
+
+    def __init__(self, engine=None, ttl=config.FSM_TTL, cache_size=config.FSM_CACHE_SIZE):
+        self.engine = engine or db.async_engine
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # ключ -> (state, data, время записи)
+        self.pending = {}  # ключ -> запись, еще не сохраненная в БД
+        self.wake = asyncio.Event()
+        self.writer = None
+        self.closing = False
+        self.sweeper = None
+
+    @staticmethod
+    def _key(key):
+        return ":".join(str(part) if part is not None else "" for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id,
+            key.destiny))
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        storage_key = self._key(key)
+        _, data, _ = await self._load(storage_key)
+        await self._save(storage_key, state, data)
+
+    async def get_state(self, key):
+        state, _, _ = await self._load(self._key(key))
+        return state
+
+    async def set_data(self, key, data):
+        storage_key = self._key(key)
+        state, _, _ = await self._load(storage_key)
+        await self._save(storage_key, state, dict(data))
+
+    async def get_data(self, key):
+        _, data, _ = await self._load(self._key(key))
+        return dict(data)
+
+    async def close(self):
+        if self.sweeper:
+            self.sweeper.cancel()
+            await asyncio.gather(self.sweeper, return_exceptions=True)
+            self.sweeper = None
+        # Запись не отменяется: отмена посреди flush потеряла бы уже взятую пачку
+        self.closing = True
+        if self.writer:
+            self.wake.set()
+            await asyncio.gather(self.writer, return_exceptions=True)
+            self.writer = None
+        await self.flush()
+
+    # Запустить периодическую очистку устаревших состояний
+    def start_sweeper(self, interval=config.FSM_SWEEP_INTERVAL):
+        """Запустить периодическую очистку устаревших состояний"""
+        self.sweeper = asyncio.create_task(self._sweep_forever(interval))
+
+    # Удалить состояния старше ttl
+    async def sweep(self):
+        """Удалить состояния старше ttl, вернуть число удаленных строк"""
+        expired_before = time.time() - self.ttl
+        for storage_key in [key for key, entry in self.cache.items() if entry[2] < expired_before]:
+            del self.cache[storage_key]
+
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                delete(FsmState).where(FsmState.updated_at < expired_before))
+        return result.rowcount
+
+    # Сохранить в БД накопленные изменения состояний
+    async def flush(self):
+        """Сохранить в БД накопленные изменения состояний одной транзакцией"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        try:
+            async with self.engine.begin() as connection:
+                for storage_key, (state, data, updated_at) in batch.items():
+                    await connection.execute(self._statement(storage_key, state, data, updated_at))
+        except BaseException:
+            # В том числе при отмене задачи; более новые изменения тех же ключей важнее
+            for storage_key, entry in batch.items():
+                self.pending.setdefault(storage_key, entry)
+            raise
+
+    async def _write_forever(self):
+        while not self.closing:
+            await self.wake.wait()
+            self.wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении состояний диалогов: {e}")
+                if not self.closing:
+                    await asyncio.sleep(1)
+                    self.wake.set()
+
+    async def _sweep_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.sweep()
+                logger.info(f"Удалено устаревших состояний диалогов: {removed}, "
+                            f"в кэше {len(self.cache)}")
+            except Exception as e:
+                logger.error(f"Ошибка при очистке состояний диалогов: {e}")
+
+    async def _load(self, storage_key):
+        entry = self.cache.get(storage_key)
+        if entry is not None:
+            self.cache.move_to_end(storage_key)
+        else:
+            # Ключ мог выпасть из кэша раньше, чем запись дошла до БД
+            entry = self.pending.get(storage_key)
+        if entry is None:
+            statement = select(FsmState.state, FsmState.data, FsmState.updated_at) \
+                .where(FsmState.key == storage_key)
+            session = current_session.get()
+            if session is not None:
+                row = (await session.execute(statement)).first()
+            else:
+                async with self.engine.connect() as connection:
+                    row = (await connection.execute(statement)).first()
+            entry = (row.state, json.loads(row.data), row.updated_at) if row else (None, {}, 0.0)
+        if storage_key not in self.cache:
+            self._remember(storage_key, entry)
+
+        if entry[2] and entry[2] < time.time() - self.ttl:
+            return None, {}, 0.0
+        return entry
+
+    async def _save(self, storage_key, state, data):
+        entry = (state, data, time.time())
+        self._remember(storage_key, entry)
+        self.pending[storage_key] = entry
+        if self.writer is None and not self.closing:
+            # Пустой контекст: запросы записи не относятся к апдейту, который ее запустил
+            self.writer = contextvars.Context().run(asyncio.create_task, self._write_forever())
+        self.wake.set()
+
+    @staticmethod
+    def _statement(storage_key, state, data, updated_at):
+        if state is None and not data:
+            return delete(FsmState).where(FsmState.key == storage_key)
+        statement = sqlite_insert(FsmState).values(
+            key=storage_key, state=state, updated_at=updated_at,
+            data=json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        return statement.on_conflict_do_update(
+            index_elements=[FsmState.key],
+            set_={"state": statement.excluded.state, "data": statement.excluded.data,
+                  "updated_at": statement.excluded.updated_at})
+
+    def _remember(self, storage_key, entry):
+        self.cache[storage_key] = entry
+        self.cache.move_to_end(storage_key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
@@ -0,0 +1,113 @@
+import functools
+import logging
+import re
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from config import config
+from metrics import metrics, current_stats, UpdateStats
+
+logger = logging.getLogger(__name__)
+
+# Списки параметров IN (?, ?, ?) разной длины считаются одним запросом
+IN_LIST = re.compile(r"\(\?(?:\s*,\s*\?)+\)")
+WHITESPACE = re.compile(r"\s+")
+MAX_PARAMETERS_LENGTH = 500
+
+
+class RepeatedQueryError(RuntimeError):
+    """Один и тот же запрос выполнен в апдейте или задаче слишком много раз"""
+
+
+# Учитывать число и время SQL-запросов движка в метриках
+def instrument_engine(engine) -> None:
+    """Учитывать число и время SQL-запросов движка в метриках
+
+    Запрос относится к апдейту, который его выполнил (current_stats), или к
+    фоновым задачам. Для асинхронного движка передается sync_engine.
+    При QUERY_DEBUG также пишутся медленные запросы и считаются повторы.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.observe_statement(elapsed)
+
+    if config.QUERY_DEBUG == "off":
+        return
+    stats = current_stats.get()
+    if elapsed * 1000 >= config.SLOW_QUERY_MS:
+        where = stats.handler if stats is not None else "фоновая задача"
+        logger.warning(f"Медленный запрос ({where}, {elapsed * 1000:.1f} мс): "
+                       f"{WHITESPACE.sub(' ', statement)} "
+                       f"параметры: {str(parameters)[:MAX_PARAMETERS_LENGTH]}")
+    if stats is not None:
+        shape = statement_shape(statement)
+        stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+
+
+# Текст запроса без различий в пробелах и длине списков IN
+def statement_shape(statement):
+    """Текст запроса без различий в пробелах и длине списков IN"""
+    return IN_LIST.sub("(?)", WHITESPACE.sub(" ", statement).strip())
+
+
+# Проверить, не повторялся ли запрос в апдейте или задаче (признак N+1)
+def check_repeated_queries(stats):
+    """Проверить, не повторялся ли запрос в апдейте или задаче (признак N+1)
+
+    Запросы, выполненные больше QUERY_REPEAT_LIMIT раз, пишутся в журнал;
+    при QUERY_DEBUG=strict поднимается RepeatedQueryError.
+    """
+    if config.QUERY_DEBUG == "off":
+        return
+    repeated = {shape: count for shape, count in stats.shapes.items()
+                if count > config.QUERY_REPEAT_LIMIT}
+    for shape, count in repeated.items():
+        logger.warning(f"Запрос выполнен {count} раз в {stats.handler} "
+                       f"(лимит {config.QUERY_REPEAT_LIMIT}): {shape}")
+    if repeated and config.QUERY_DEBUG == "strict":
+        raise RepeatedQueryError(f"{stats.handler}: {len(repeated)} запросов выполнено больше "
+                                 f"{config.QUERY_REPEAT_LIMIT} раз")
+
+
+# Учитывать запросы блока кода как отдельную задачу
+@contextmanager
+def track_queries(name):
+    """Учитывать запросы блока кода как отдельную задачу
+
+    Используется для задач планировщика: повторы считаются по всей задаче
+    и проверяются после ее успешного завершения. Без QUERY_DEBUG ничего не делает.
+    """
+    if config.QUERY_DEBUG == "off":
+        yield None
+        return
+    stats = UpdateStats()
+    stats.handler = name
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+    check_repeated_queries(stats)
+
+
+# Декоратор задачи планировщика для track_queries
+def tracked_job(function):
+    """Декоратор задачи планировщика для track_queries"""
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        with track_queries(function.__name__):
+            return await function(*args, **kwargs)
+
+    return wrapper
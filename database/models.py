@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, \
+    Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -23,6 +24,12 @@ class User(Base):
 
 class Subscription(Base):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        # Выборка кандидатов для ежедневных уведомлений
+        Index('ix_subscriptions_notify', 'is_active', 'notifications_enabled', 'next_payment_date'),
+        # Постраничный /list: ключ пагинации (next_payment_date, id) внутри пользователя
+        Index('ix_subscriptions_user_page', 'user_id', 'is_active', 'next_payment_date', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -53,8 +60,47 @@ class Category(Base):
     subscriptions = relationship("Subscription", back_populates="category")
 
 
+class UserSpending(Base):
+    """Расходы пользователя по активным подпискам, приведенные к месяцу и году
+
+    Обновляется вместе с подписками (SpendingService.apply), пересчитывается
+    командой python manage.py rebuild-spending.
+    """
+    __tablename__ = 'user_spending'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    monthly_total = Column(Float, nullable=False, default=0.0)
+    yearly_total = Column(Float, nullable=False, default=0.0)
+
+
+class CategorySpending(Base):
+    """Расходы пользователя по категориям (category_id = 0 - без категории)"""
+    __tablename__ = 'category_spending'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    category_id = Column(Integer, primary_key=True)
+    monthly_total = Column(Float, nullable=False, default=0.0)
+    yearly_total = Column(Float, nullable=False, default=0.0)
+
+
+class FsmState(Base):
+    """Состояние диалога aiogram FSM (SqliteStorage)"""
+    __tablename__ = 'fsm_states'
+
+    key = Column(String(200), primary_key=True)
+    state = Column(String(100), nullable=True)
+    data = Column(Text, nullable=False, default="{}")
+    updated_at = Column(Float, nullable=False, index=True)  # time.time() последней записи
+
+
 class Notification(Base):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Не больше одного напоминания по подписке на каждую дату рассылки
+        Index('uq_notifications_subscription_scheduled', 'subscription_id', 'scheduled_for',
+              unique=True),
+        Index('ix_notifications_pending', 'is_sent', 'scheduled_for', 'user_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
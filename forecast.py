@@ -0,0 +1,90 @@
+from collections import namedtuple
+from datetime import date
+import numpy as np
+from analytics import PERIODS
+
+MONTHLY, YEARLY, WEEKLY = (PERIODS.index(period) for period in ("monthly", "yearly", "weekly"))
+# Шаг в месяцах для месячных и годовых подписок по коду периода
+MONTH_STEPS = np.array([1 if code == MONTHLY else 12 if code == YEARLY else 0
+                        for code in range(len(PERIODS))])
+
+Forecast = namedtuple("Forecast", ["start", "end", "dates", "subscriptions", "amounts", "months"])
+
+
+# Начало месяца, сдвинутого на months от даты
+def month_start(day, months=0):
+    """Начало месяца, сдвинутого на months от даты"""
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    return date(year, month + 1, 1)
+
+
+# Все платежи подписок на горизонте в months месяцев
+def forecast_payments(arrays, months, today=None):
+    """Все платежи подписок на горизонте в months месяцев
+
+    Горизонт - с сегодняшнего дня до конца (months - 1)-го месяца после текущего.
+    Даты строятся по тем же правилам, что и update_next_payment_dates: месячные и
+    годовые - в день платежа, ограниченный длиной месяца, еженедельные - через 7 дней.
+    Все подписки обрабатываются одной матрицей (подписка x номер платежа).
+    Возвращает Forecast: даты платежей по возрастанию, индексы подписок в arrays,
+    суммы и итоги по месяцам [(начало месяца, сумма)].
+    """
+    today = today or date.today()
+    start = np.datetime64(today, "D")
+    end = np.datetime64(month_start(today, months), "D")
+    month_starts = np.arange(np.datetime64(month_start(today), "M"),
+                             np.datetime64(month_start(today, months), "M") + 1)
+
+    periods = arrays.period
+    next_date = arrays.next_date
+    weekly = periods == WEEKLY
+    steps = np.maximum(MONTH_STEPS[periods], 1)
+
+    # Номер первого платежа, который может попасть в горизонт
+    next_month = next_date.astype("datetime64[M]")
+    months_behind = (start.astype("datetime64[M]") - next_month).astype(np.int64)
+    days_behind = (start - next_date).astype(np.int64)
+    first = np.where(weekly, -(-days_behind // 7), -(-months_behind // steps))
+    first = np.maximum(first - 1, 0)
+
+    columns = max((end - start).astype(np.int64) // 7 + 3, months + 2)
+    k = first[:, None] + np.arange(columns)[None, :]
+
+    # Еженедельные: next_date + 7k
+    weekly_dates = next_date[:, None] + (7 * k).astype("timedelta64[D]")
+
+    # Месячные и годовые: день платежа в месяце next_date + step * k
+    occurrence_month = next_month[:, None] + (steps[:, None] * k).astype("timedelta64[M]")
+    first_day = occurrence_month.astype("datetime64[D]")
+    days_in_month = ((occurrence_month + 1).astype("datetime64[D]") - first_day).astype(np.int64)
+    day = np.minimum(arrays.payment_day[:, None], days_in_month)
+    monthly_dates = first_day + (day - 1).astype("timedelta64[D]")
+    # Первый платеж - сохраненная дата, даже если она не совпадает с днем платежа
+    monthly_dates = np.where(k == 0, next_date[:, None], monthly_dates)
+
+    dates = np.where(weekly[:, None], weekly_dates, monthly_dates)
+    mask = (dates >= start) & (dates < end)
+    rows, _ = np.nonzero(mask)
+    dates = dates[mask]
+
+    order = np.argsort(dates, kind="stable")
+    dates = dates[order]
+    subscriptions = rows[order]
+    amounts = arrays.price[subscriptions]
+
+    month_index = (dates.astype("datetime64[M]") - month_starts[0]).astype(np.int64)
+    totals = np.bincount(month_index, weights=amounts, minlength=months)[:months]
+    return Forecast(start=today, end=end.item(), dates=dates, subscriptions=subscriptions,
+                    amounts=amounts,
+                    months=[(month.item(), float(total))
+                            for month, total in zip(month_starts[:months], totals)])
+
+
+# Платежи прогноза по дням
+def payments_by_day(forecast, arrays):
+    """Платежи прогноза по дням: [(дата, [(название, сумма), ...])]"""
+    days, first_index = np.unique(forecast.dates, return_index=True)
+    bounds = list(first_index[1:]) + [len(forecast.dates)]
+    return [(day.item(), [(arrays.names[forecast.subscriptions[i]], float(forecast.amounts[i]))
+                          for i in range(begin, finish)])
+            for day, begin, finish in zip(days, first_index, bounds)]
@@ -9,3 +9,7 @@ from .category import cmd_category
 from .edit import cmd_edit
 from .toggle import cmd_toggle
 from .delete import cmd_delete
+from .stats import cmd_stats
+from .forecast import cmd_forecast
+from .transfer import cmd_import, cmd_export
+from .metrics import cmd_metrics
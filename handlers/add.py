@@ -3,11 +3,9 @@ from phrases import ADD_TEXT
 from aiogram import F
 from aiogram.filters import Command
 from aiogram.fsm.state import State, StatesGroup
-from database.database import get_db
 from services import SubscriptionService
-from keyboards import get_main_keyboard, get_cancel_keyboard, get_categories_keyboard, \
-    get_billing_period_keyboard
-from database.models import Category
+from keyboards import get_main_keyboard, get_cancel_keyboard, get_billing_period_keyboard
+from cache import category_cache
 from handlers import router
 
 
@@ -114,7 +112,7 @@ async def process_payment_day(message, state):
 
 # Обработка выбора периодичности
 @router.callback_query(AddSubscription.waiting_for_period, F.data.startswith("period_"))
-async def process_billing_period(callback, state):
+async def process_billing_period(callback, state, session):
     """Обработка выбора периодичности"""
     period = callback.data.split("_")[1]
     period_names = {
@@ -124,28 +122,25 @@ async def process_billing_period(callback, state):
     }
 
     await state.update_data(billing_period=period)
-    db = next(get_db())
-    categories = SubscriptionService.get_categories(db)
+    keyboard = await category_cache.get_keyboard(session)
 
     await callback.message.edit_text(
         f"Периодичность: *{period_names.get(period, period)}*\n\nВыберите категорию подписки:",
         parse_mode="Markdown"
     )
-    await callback.message.edit_reply_markup(reply_markup=get_categories_keyboard(categories))
+    await callback.message.edit_reply_markup(reply_markup=keyboard)
     await state.set_state(AddSubscription.waiting_for_category)
-    db.close()
 
 
 # Обработка выбора категории
 @router.callback_query(AddSubscription.waiting_for_category, F.data.startswith("category_"))
-async def process_category(callback, state):
+async def process_category(callback, state, session):
     """Обработка выбора категории"""
     category_id = int(callback.data.split("_")[1])
     data = await state.get_data()
-    db = next(get_db())
     try:
-        subscription = SubscriptionService.add_subscription(
-            db,
+        subscription = await SubscriptionService.add_subscription(
+            session,
             callback.from_user.id,
             data['name'],
             data['price'],
@@ -154,8 +149,7 @@ async def process_category(callback, state):
             category_id
         )
 
-        category = db.query(Category).filter(Category.id == category_id).first()
-        category_name = category.name if category else "Без категории"
+        category_name = await category_cache.get_name(session, category_id)
         success_text = (
             f"""*Подписка успешно добавлена!*
 
@@ -182,12 +176,11 @@ async def process_category(callback, state):
         await callback.message.answer(f"Ошибка при добавлении подписки: {str(e)}",
                                       reply_markup=get_main_keyboard())
         await state.clear()
-    db.close()
 
 
 # Обработчик команды /subscription с параметрами
 @router.message(Command("subscription"))
-async def cmd_subscription_full(message):
+async def cmd_subscription_full(message, session):
     """Обработчик команды /subscription с параметрами"""
     text = message.text.strip()
     pattern = r'^/subscription\s+добавить\s+"([^"]+)"\s+(\d+(?:\.\d+)?)\s+(\d+)$'
@@ -212,11 +205,9 @@ async def cmd_subscription_full(message):
         await message.answer("День должен быть от 1 до 31.")
         return
 
-    db = next(get_db())
-
     try:
-        subscription = SubscriptionService.add_subscription(db, message.from_user.id,
-                                                            name, price, day)
+        subscription = await SubscriptionService.add_subscription(session, message.from_user.id,
+                                                                  name, price, day)
 
         await message.answer(
             f"""Подписка *{name}* успешно добавлена!\n\n
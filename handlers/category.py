@@ -1,15 +1,13 @@
 from aiogram.filters import Command
-from database.database import get_db
 from handlers import router
-from services import SubscriptionService
+from cache import category_cache
 
 
 # Обработчик команды /category
 @router.message(Command("category"))
-async def cmd_category(message):
+async def cmd_category(message, session):
     """Обработчик команды /category"""
-    db = next(get_db())
-    categories = SubscriptionService.get_categories(db)
+    categories = await category_cache.get_categories(session)
 
     if not categories:
         await message.answer("Категории не найдены.")
@@ -1,6 +1,5 @@
 from aiogram import F
 from aiogram.filters import Command
-from database.database import get_db
 from handlers import router
 from services import SubscriptionService
 
@@ -8,7 +7,7 @@ from services import SubscriptionService
 # Обработчик команды /delete (Удаление подписки)
 @router.message(F.text == "Удалить")
 @router.message(Command("delete"))
-async def cmd_delete(message):
+async def cmd_delete(message, session):
     """Удаление подписки"""
     try:
         parts = message.text.split()
@@ -20,9 +19,8 @@ async def cmd_delete(message):
             return
 
         subscription_id = int(parts[1])
-        db = next(get_db())
-
-        success = SubscriptionService.delete_subscription(db, subscription_id, message.from_user.id)
+        success = await SubscriptionService.delete_subscription(session, subscription_id,
+                                                                message.from_user.id)
 
         if success:
             await message.answer(f"Подписка ID:{subscription_id} удалена")
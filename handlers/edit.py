@@ -3,12 +3,10 @@ from aiogram.filters import Command
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from database.database import get_db
 from handlers import router
 from services import SubscriptionService
-from keyboards import get_main_keyboard, get_cancel_keyboard, get_categories_keyboard, \
-    get_billing_period_keyboard
-from database.models import Category
+from keyboards import get_main_keyboard, get_cancel_keyboard, get_billing_period_keyboard
+from cache import category_cache
 
 
 class EditSubscription(StatesGroup):
@@ -41,7 +39,7 @@ async def start_edit_subscription(callback, state):
 
 # Выбор поля для редактирования
 @router.callback_query(F.data.startswith("edit_field_"))
-async def select_edit_field(callback, state):
+async def select_edit_field(callback, state, session):
     """Выбор поля для редактирования"""
     field = callback.data.split("_")[2]
     await state.update_data(edit_field=field)
@@ -69,21 +67,16 @@ async def select_edit_field(callback, state):
         await state.set_state(EditSubscription.waiting_for_period)
 
     elif field == "category":
-        db = next(get_db())
-        try:
-            categories = SubscriptionService.get_categories(db)
-            await callback.message.edit_text("Выберите новую категорию подписки:",
-                                             parse_mode="Markdown")
-            await callback.message.edit_reply_markup(
-                reply_markup=get_categories_keyboard(categories))
-            await state.set_state(EditSubscription.waiting_for_category)
-        finally:
-            db.close()
+        keyboard = await category_cache.get_keyboard(session)
+        await callback.message.edit_text("Выберите новую категорию подписки:",
+                                         parse_mode="Markdown")
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+        await state.set_state(EditSubscription.waiting_for_category)
 
 
 # Обработка нового значения для редактирования
 @router.message(EditSubscription.waiting_for_value)
-async def process_edit_value(message, state):
+async def process_edit_value(message, state, session):
     """Обработка нового значения при редактировании"""
     data = await state.get_data()
     subscription_id = data.get('subscription_id')
@@ -99,7 +92,6 @@ async def process_edit_value(message, state):
         await message.answer("Редактирование отменено", reply_markup=get_main_keyboard())
         return
 
-    db = next(get_db())
     try:
         update_data = {}
 
@@ -132,8 +124,9 @@ async def process_edit_value(message, state):
                 await message.answer("Пожалуйста, введите число от 1 до 31:")
                 return
 
-        updated = SubscriptionService.update_subscription(db, subscription_id, message.from_user.id,
-                                                          **update_data)
+        updated = await SubscriptionService.update_subscription(session, subscription_id,
+                                                                message.from_user.id,
+                                                                **update_data)
 
         if updated:
             await message.answer(
@@ -147,15 +140,13 @@ async def process_edit_value(message, state):
 
     except Exception as e:
         await message.answer(f"Ошибка при обновлении: {str(e)}", reply_markup=get_main_keyboard())
-    finally:
-        db.close()
 
     await state.clear()
 
 
 # Обработка нового периода при редактировании
 @router.callback_query(EditSubscription.waiting_for_period, F.data.startswith("period_"))
-async def process_edit_period(callback, state):
+async def process_edit_period(callback, state, session):
     """Обработка нового периода при редактировании"""
     period = callback.data.split("_")[1]
     data = await state.get_data()
@@ -165,11 +156,10 @@ async def process_edit_period(callback, state):
         await callback.answer("Ошибка: данные не найдены")
         return
 
-    db = next(get_db())
     try:
-        updated = SubscriptionService.update_subscription(db, subscription_id,
-                                                          callback.from_user.id,
-                                                          billing_period=period)
+        updated = await SubscriptionService.update_subscription(session, subscription_id,
+                                                                callback.from_user.id,
+                                                                billing_period=period)
 
         if updated:
             period_names = {
@@ -192,15 +182,13 @@ async def process_edit_period(callback, state):
     except Exception as e:
         await callback.message.answer(f"Ошибка при обновлении: {str(e)}",
                                       reply_markup=get_main_keyboard())
-    finally:
-        db.close()
 
     await state.clear()
 
 
 # Обработка новой категории при редактировании
 @router.callback_query(EditSubscription.waiting_for_category, F.data.startswith("category_"))
-async def process_edit_category(callback, state):
+async def process_edit_category(callback, state, session):
     """Обработка новой категории при редактировании"""
     category_id = int(callback.data.split("_")[1])
     data = await state.get_data()
@@ -210,15 +198,13 @@ async def process_edit_category(callback, state):
         await callback.answer("Ошибка: данные не найдены")
         return
 
-    db = next(get_db())
     try:
-        updated = SubscriptionService.update_subscription(db, subscription_id,
-                                                          callback.from_user.id,
-                                                          category_id=category_id)
+        updated = await SubscriptionService.update_subscription(session, subscription_id,
+                                                                callback.from_user.id,
+                                                                category_id=category_id)
 
         if updated:
-            category = db.query(Category).filter(Category.id == category_id).first()
-            category_name = category.name if category else "Без категории"
+            category_name = await category_cache.get_name(session, category_id)
 
             await callback.message.edit_text(
                 f"Подписка успешно обновлена!\n"
@@ -236,8 +222,6 @@ async def process_edit_category(callback, state):
     except Exception as e:
         await callback.message.answer(f"Ошибка при обновлении: {str(e)}",
                                       reply_markup=get_main_keyboard())
-    finally:
-        db.close()
 
     await state.clear()
 
@@ -254,7 +238,7 @@ async def cancel_edit(callback, state):
 # Обработчик команды /edit
 @router.message(F.text == "Редактировать")
 @router.message(Command("edit"))
-async def cmd_edit(message):
+async def cmd_edit(message, session):
     """Обработчик команды /edit"""
     try:
         parts = message.text.split()
@@ -271,87 +255,79 @@ async def cmd_edit(message):
         subscription_id = int(parts[1])
 
         if len(parts) == 2:
-            db = next(get_db())
-            try:
-                subscription = SubscriptionService.get_subscription_by_id(db, subscription_id,
-                                                                          message.from_user.id)
+            subscription = await SubscriptionService.get_subscription_by_id(
+                session, subscription_id, message.from_user.id)
 
-                if not subscription:
-                    await message.answer("Подписка не найдена")
-                    return
+            if not subscription:
+                await message.answer("Подписка не найдена")
+                return
 
-                category_name = subscription.category.name if subscription.category else "Без категории"
-                next_payment = subscription.next_payment_date.strftime("%d.%m.%Y")
-                status = "Активна" if subscription.is_active else "Приостановлена"
-
-                response = (
-                    f"*Информация о подписке:*\n\n"
-                    f"ID: {subscription.id}\n"
-                    f"Название: {subscription.name}\n"
-                    f"Стоимость: {subscription.price:.2f} {subscription.currency}\n"
-                    f"День платежа: {subscription.payment_day}-е число\n"
-                    f"Периодичность: {subscription.billing_period}\n"
-                    f"Категория: {category_name}\n"
-                    f"Следующий платеж: {next_payment}\n"
-                    f"Статус: {status}\n\n"
-                    f"Чтобы изменить:\n"
-                    f"/edit {subscription.id} название 'Новое название'\n"
-                    f"/edit {subscription.id} цена 499\n"
-                    f"/edit {subscription.id} день 15"
-                )
+            category_name = subscription.category.name if subscription.category else "Без категории"
+            next_payment = subscription.next_payment_date.strftime("%d.%m.%Y")
+            status = "Активна" if subscription.is_active else "Приостановлена"
+
+            response = (
+                f"*Информация о подписке:*\n\n"
+                f"ID: {subscription.id}\n"
+                f"Название: {subscription.name}\n"
+                f"Стоимость: {subscription.price:.2f} {subscription.currency}\n"
+                f"День платежа: {subscription.payment_day}-е число\n"
+                f"Периодичность: {subscription.billing_period}\n"
+                f"Категория: {category_name}\n"
+                f"Следующий платеж: {next_payment}\n"
+                f"Статус: {status}\n\n"
+                f"Чтобы изменить:\n"
+                f"/edit {subscription.id} название 'Новое название'\n"
+                f"/edit {subscription.id} цена 499\n"
+                f"/edit {subscription.id} день 15"
+            )
 
-                await message.answer(response, parse_mode="Markdown")
-            finally:
-                db.close()
+            await message.answer(response, parse_mode="Markdown")
             return
 
         if len(parts) >= 4:
             field = parts[2].lower()
             value = " ".join(parts[3:])
 
-            db = next(get_db())
-            try:
-                if field in ["название", "name"]:
-                    update_data = {"name": value}
-                elif field in ["цена", "price", "стоимость"]:
-                    try:
-                        price = float(value.replace(',', '.'))
-                        if price <= 0:
-                            await message.answer("Стоимость должна быть больше 0")
-                            return
-                        update_data = {"price": price}
-                    except ValueError:
-                        await message.answer("Неверный формат цены. Используйте число")
+            if field in ["название", "name"]:
+                update_data = {"name": value}
+            elif field in ["цена", "price", "стоимость"]:
+                try:
+                    price = float(value.replace(',', '.'))
+                    if price <= 0:
+                        await message.answer("Стоимость должна быть больше 0")
                         return
-                elif field in ["день", "day"]:
-                    try:
-                        day = int(value)
-                        if day < 1 or day > 31:
-                            await message.answer("День должен быть от 1 до 31")
-                            return
-                        update_data = {"payment_day": day}
-                    except ValueError:
-                        await message.answer("Неверный формат дня. Используйте число от 1 до 31")
+                    update_data = {"price": price}
+                except ValueError:
+                    await message.answer("Неверный формат цены. Используйте число")
+                    return
+            elif field in ["день", "day"]:
+                try:
+                    day = int(value)
+                    if day < 1 or day > 31:
+                        await message.answer("День должен быть от 1 до 31")
                         return
-                else:
-                    await message.answer(
-                        "Неизвестное поле. Доступные поля:\n"
-                        "- название (name)\n"
-                        "- цена (price)\n"
-                        "- день (day)"
-                    )
+                    update_data = {"payment_day": day}
+                except ValueError:
+                    await message.answer("Неверный формат дня. Используйте число от 1 до 31")
                     return
+            else:
+                await message.answer(
+                    "Неизвестное поле. Доступные поля:\n"
+                    "- название (name)\n"
+                    "- цена (price)\n"
+                    "- день (day)"
+                )
+                return
 
-                updated = SubscriptionService.update_subscription(db, subscription_id,
-                                                                  message.from_user.id,
-                                                                  **update_data)
+            updated = await SubscriptionService.update_subscription(session, subscription_id,
+                                                                    message.from_user.id,
+                                                                    **update_data)
 
-                if updated:
-                    await message.answer(f"Подписка успешно обновлена!")
-                else:
-                    await message.answer("Не удалось обновить подписку")
-            finally:
-                db.close()
+            if updated:
+                await message.answer(f"Подписка успешно обновлена!")
+            else:
+                await message.answer("Не удалось обновить подписку")
 
     except ValueError:
         await message.answer("Неверный формат ID. Используйте число")
@@ -0,0 +1,82 @@
+from aiogram.filters import Command
+from cache import render_cache
+from config import config
+from handlers import router
+
+MONTH_NAMES = ["Январь", "Февраль", "Март", "Апрель", "Май", "Июнь", "Июль", "Август",
+               "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"]
+
+
+# Обработчик команды /forecast
+@router.message(Command("forecast"))
+async def cmd_forecast(message, session):
+    """Обработчик команды /forecast"""
+    parts = message.text.split()
+    try:
+        months = int(parts[1]) if len(parts) > 1 else 3
+    except ValueError:
+        await message.answer(f"Использование: /forecast <число месяцев от 1 до "
+                             f"{config.FORECAST_MAX_MONTHS}>\nПример: /forecast 6")
+        return
+    months = max(1, min(config.FORECAST_MAX_MONTHS, months))
+
+    telegram_id = message.from_user.id
+    view = f"forecast_{months}"
+    chunks = render_cache.get(telegram_id, view)
+    if chunks is None:
+        # numpy загружается при первом прогнозе, а не при запуске бота
+        from analytics import load_subscription_arrays
+        from forecast import forecast_payments, payments_by_day
+
+        generation = render_cache.generation
+        arrays = await load_subscription_arrays(session, telegram_id)
+        forecast = forecast_payments(arrays, months)
+        chunks = render_forecast(forecast, payments_by_day(forecast, arrays), months)
+        render_cache.put(telegram_id, view, chunks, generation)
+
+    if not chunks:
+        await message.answer(f"В ближайшие {months} мес. у вас нет платежей по активным подпискам")
+        return
+
+    for chunk in chunks:
+        await message.answer(chunk, parse_mode="Markdown")
+
+
+# Сообщения прогноза платежей (пустой список, если платежей нет)
+def render_forecast(forecast, days, months, limit=config.MESSAGE_MAX_LENGTH, max_messages=5):
+    """Сообщения прогноза платежей (пустой список, если платежей нет)
+
+    Итоги по месяцам идут первыми; список по дням обрезается после
+    max_messages сообщений.
+    """
+    if not days:
+        return []
+
+    total = sum(amount for _, amount in forecast.months)
+    blocks = [f"*Прогноз платежей на {months} мес.*\nВсего: *{total:.2f} рублей*"]
+    blocks.append("\n".join(f"{MONTH_NAMES[month.month - 1]} {month.year}: {amount:.2f} рублей"
+                            for month, amount in forecast.months))
+
+    current_month = None
+    for day, payments in days:
+        if (day.year, day.month) != current_month:
+            current_month = (day.year, day.month)
+            blocks.append(f"*{MONTH_NAMES[day.month - 1]} {day.year}*")
+        items = ", ".join(f"{name} - {amount:.2f}" for name, amount in payments)
+        blocks.append(f"{day.strftime('%d.%m')}: {items}")
+
+    # Блоки не разрываются между сообщениями
+    truncated = "\n\n_Показаны не все платежи: уменьшите горизонт прогноза_"
+    limit -= len(truncated)
+    chunks = [""]
+    for block in blocks:
+        block = block[:limit]
+        separator = "\n\n" if block.startswith("*") else "\n"
+        if chunks[-1] and len(chunks[-1]) + len(separator) + len(block) > limit:
+            chunks.append("")
+        chunks[-1] += (separator if chunks[-1] else "") + block
+
+    if len(chunks) > max_messages:
+        chunks = chunks[:max_messages]
+        chunks[-1] += truncated
+    return chunks
@@ -1,97 +1,155 @@
+from datetime import date
 from aiogram import F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from database.database import get_db
-from services import SubscriptionService
-from keyboards import get_main_keyboard
+from services import SubscriptionService, CostNormalizer
+from keyboards import get_main_keyboard, get_list_keyboard
+from cache import render_cache
+from config import config
 from handlers import router
 
+PERIOD_NAMES = {
+    "weekly": "еженедельно",
+    "monthly": "ежемесячно",
+    "yearly": "ежегодно"
+}
+
+LIST_FOOTER = (
+    """*Управление подписками:*
+`/edit <ID>` - редактировать подписку
+`/toggle <ID>` - приостановить/возобновить
+`/delete <ID>` - удалить подписку
+
+*Пример:* `/edit 1` - редактировать подписку с ID 1"""
+)
+
 
 # Обработчик команды /list
 @router.message(Command("list"))
 @router.message(F.text == "Мои подписки")
-async def cmd_list(message):
+async def cmd_list(message, session):
     """Обработчик команды /list"""
-    db = next(get_db())
-    subscriptions = SubscriptionService.get_user_subscriptions(db, message.from_user.id,
-                                                               active_only=False)
+    telegram_id = message.from_user.id
+    page = await get_list_page(session, telegram_id, active=True)
+    if page is None:
+        page = await get_list_page(session, telegram_id, active=False)
 
-    if not subscriptions:
+    if page is None:
         await message.answer("У вас пока нет активных подписок.\n"
                              "Добавьте первую с помощью /add или кнопки 'Добавить подписку'.",
                              reply_markup=get_main_keyboard())
         return
 
-    active_subs = [sub for sub in subscriptions if sub.is_active]
-    inactive_subs = [sub for sub in subscriptions if not sub.is_active]
-    response = ""
-    period = {
-        "weekly": "еженедельно",
-        "monthly": "ежемесячно",
-        "yearly": "ежегодно"
-    }
-    if active_subs:
-        response += "*Активные подписки:*\n\n"
-        total_monthly = 0
-        total_yearly = 0
-
-        for i, sub in enumerate(active_subs, 1):
-            if sub.billing_period == "monthly":
-                monthly_cost = sub.price
-                yearly_cost = sub.price * 12
-            elif sub.billing_period == "yearly":
-                monthly_cost = sub.price / 12
-                yearly_cost = sub.price
-            elif sub.billing_period == "weekly":
-                monthly_cost = sub.price * 4.33
-                yearly_cost = sub.price * 52
-            else:
-                monthly_cost = sub.price
-                yearly_cost = sub.price * 12
-
-            total_monthly += monthly_cost
-            total_yearly += yearly_cost
-
-            category_name = sub.category.name if sub.category else "Без категории"
-            next_payment = sub.next_payment_date.strftime("%d.%m.%Y")
+    text, keyboard = page
+    await message.answer(text, parse_mode="Markdown", reply_markup=keyboard)
+
+
+# Переключение страниц и фильтра списка подписок
+@router.callback_query(F.data.startswith("list_"))
+async def process_list_page(callback, session):
+    """Переключение страниц и фильтра списка подписок"""
+    parts = callback.data.split("_")
+    active = parts[1] == "a"
+    after = before = None
+    if len(parts) == 5:
+        cursor = (date.fromordinal(int(parts[3])), int(parts[4]))
+        if parts[2] == "n":
+            after = cursor
+        else:
+            before = cursor
+
+    page = await get_list_page(session, callback.from_user.id, active, after, before)
+    if page is None and (after or before):
+        # Подписки страницы удалены или изменены - показываем первую страницу
+        page = await get_list_page(session, callback.from_user.id, active)
+    text, keyboard = page or (empty_list_text(active), get_list_keyboard(active))
+
+    try:
+        await callback.message.edit_text(text, parse_mode="Markdown", reply_markup=keyboard)
+    except TelegramBadRequest:
+        # Сообщение не изменилось (повторное нажатие той же кнопки)
+        pass
+    await callback.answer()
+
+
+# Получить текст и клавиатуру страницы списка
+async def get_list_page(session, telegram_id, active, after=None, before=None):
+    """Получить текст и клавиатуру страницы списка (None, если страница пуста)
+
+    Читается только видимая страница; готовая страница кэшируется до
+    следующего изменения подписок пользователя.
+    """
+    status = "a" if active else "i"
+    view = f"list_{status}" + (f"_n_{cursor_key(after)}" if after else "") \
+        + (f"_p_{cursor_key(before)}" if before else "")
+    page = render_cache.get(telegram_id, view)
+    if page is not None:
+        return page or None
+
+    generation = render_cache.generation
+    subscriptions, has_more = await SubscriptionService.get_subscriptions_page(
+        session, telegram_id, active, after=after, before=before, limit=config.LIST_PAGE_SIZE)
 
-            response += (
-                f"""{i}. *{sub.name}* (ID: `{sub.id}`)
-{sub.price:.2f} {sub.currency} ({period[sub.billing_period]})
-Следующий платеж: {next_payment}
-Категория: {category_name}
-В месяц: {monthly_cost:.2f} рублей\n\n"""
-            )
+    if not subscriptions:
+        page = ()
+    else:
+        first = cursor_key((subscriptions[0].next_payment_date, subscriptions[0].id))
+        last = cursor_key((subscriptions[-1].next_payment_date, subscriptions[-1].id))
+        if before:
+            prev_cursor, next_cursor = (first if has_more else None), last
+        else:
+            prev_cursor, next_cursor = (first if after else None), (last if has_more else None)
 
-        response += f"*Итого активных в месяц: {total_monthly:.2f} рублей*\n"
-        response += f"*Итого активных в год: {total_yearly:.2f} рублей*\n\n"
+        totals = await SubscriptionService.calculate_totals(session, telegram_id) if active else None
+        page = (render_list_page(subscriptions, active, totals),
+                get_list_keyboard(active, prev_cursor, next_cursor))
 
-    else:
-        response += "*У вас нет активных подписок*\n\n"
+    render_cache.put(telegram_id, view, page, generation)
+    return page or None
 
-    if inactive_subs:
-        response += "*Неактивные подписки:*\n\n"
 
-        for i, sub in enumerate(inactive_subs, 1):
-            category_name = sub.category.name if sub.category else "Без категории"
-            next_payment = sub.next_payment_date.strftime(
-                "%d.%m.%Y") if sub.next_payment_date else "—"
+# Ключ пагинации в виде строки для callback_data
+def cursor_key(cursor):
+    """Ключ пагинации (дата, id) в виде строки для callback_data"""
+    payment_date, subscription_id = cursor
+    return f"{payment_date.toordinal()}_{subscription_id}"
 
+
+# Текст пустого списка для фильтра
+def empty_list_text(active):
+    """Текст пустого списка для фильтра"""
+    return "*У вас нет активных подписок*" if active else "*У вас нет неактивных подписок*"
+
+
+# Текст страницы списка подписок
+def render_list_page(subscriptions, active, totals=None):
+    """Текст страницы списка подписок"""
+    response = "*Активные подписки:*\n\n" if active else "*Неактивные подписки:*\n\n"
+
+    for sub in subscriptions:
+        category_name = sub.category.name if sub.category else "Без категории"
+        next_payment = sub.next_payment_date.strftime("%d.%m.%Y") if sub.next_payment_date else "—"
+        period = PERIOD_NAMES.get(sub.billing_period, sub.billing_period)
+
+        if active:
+            monthly_cost = CostNormalizer.monthly(sub.price, sub.billing_period)
             response += (
-                f"""{i}. *{sub.name}* (ID: `{sub.id}`) [приостановлена]
-{sub.price:.2f} {sub.currency} ({period[sub.billing_period]})
+                f"""*{sub.name}* (ID: `{sub.id}`)
+{sub.price:.2f} {sub.currency} ({period})
+Следующий платеж: {next_payment}
+Категория: {category_name}
+В месяц: {monthly_cost:.2f} рублей\n\n"""
+            )
+        else:
+            response += (
+                f"""*{sub.name}* (ID: `{sub.id}`) [приостановлена]
+{sub.price:.2f} {sub.currency} ({period})
 Следующий платеж: {next_payment}
 Категория: {category_name}\n\n"""
             )
-    else:
-        response += "*У вас нет неактивных подписок*\n\n"
-
-    response += (
-        """*Управление подписками:*
-`/edit <ID>` - редактировать подписку
-`/toggle <ID>` - приостановить/возобновить
-`/delete <ID>` - удалить подписку
 
-*Пример:* `/edit 1` - редактировать подписку с ID 1"""
-)
+    if totals is not None:
+        response += f"*Итого активных в месяц: {totals['monthly']:.2f} рублей*\n"
+        response += f"*Итого активных в год: {totals['yearly']:.2f} рублей*\n\n"
 
-    await message.answer(response, parse_mode="Markdown")
\ No newline at end of file
+    return response + LIST_FOOTER
@@ -0,0 +1,35 @@
+from aiogram import F
+from aiogram.filters import Command
+from config import config
+from database.database import db
+from metrics import metrics
+from handlers import router
+
+MAX_HANDLERS = 20
+
+
+# Обработчик команды /metrics (только для администраторов)
+@router.message(Command("metrics"), F.from_user.id.in_(config.ADMIN_IDS))
+async def cmd_metrics(message):
+    """Обработчик команды /metrics (только для администраторов)"""
+    await message.answer(render_metrics(metrics.summary(), db.pool_status()), parse_mode="Markdown")
+
+
+# Текст сводки метрик по обработчикам
+def render_metrics(rows, pool_status):
+    """Текст сводки метрик по обработчикам"""
+    if not rows:
+        return "Апдейтов с момента запуска еще не было."
+
+    lines = [f"{'обработчик':<24} {'вызовы':>7} {'ошибки':>6} {'p50 мс':>7} {'p95 мс':>7} "
+             f"{'SQL':>5} {'БД мс':>6}"]
+    for row in rows[:MAX_HANDLERS]:
+        lines.append(f"{row['handler'][:24]:<24} {row['count']:>7} {row['errors']:>6} "
+                     f"{row['p50'] * 1000:>7.1f} {row['p95'] * 1000:>7.1f} "
+                     f"{row['statements']:>5.1f} {row['db_time'] * 1000:>6.1f}")
+
+    return ("*Метрики обработчиков*\n"
+            "SQL и БД мс - среднее на апдейт\n\n"
+            "```\n" + "\n".join(lines) + "\n```\n"
+            f"Пул соединений: занято {pool_status['in_use']} при размере {pool_status['size']} "
+            f"+ {pool_status['max_overflow']}")
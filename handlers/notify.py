@@ -1,19 +1,16 @@
 from aiogram import F
 from aiogram.filters import Command
-from database.database import get_db
 from handlers import router
 from services import SubscriptionService
 from keyboards import get_main_keyboard, get_notification_days_keyboard
-from database.models import User
 
 
 # Обработчик команды /notify
 @router.message(Command("notify"))
 @router.message(F.text == "Настройки уведомлений")
-async def cmd_notify(message):
+async def cmd_notify(message, session):
     """Обработчик команды /notify"""
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == message.from_user.id).first()
+    user = await SubscriptionService.get_user(session, message.from_user.id)
 
     if not user:
         await message.answer("Сначала зарегистрируйтесь с помощью /start")
@@ -32,11 +29,10 @@ async def cmd_notify(message):
 
 # Обработка выбора дней уведомления
 @router.callback_query(F.data.startswith("notify_"))
-async def process_notification_days(callback):
+async def process_notification_days(callback, session):
     """Обработка выбора дней уведомления"""
     days = int(callback.data.split("_")[1])
-    db = next(get_db())
-    success = SubscriptionService.set_notification_days(db, callback.from_user.id, days)
+    success = await SubscriptionService.set_notification_days(session, callback.from_user.id, days)
 
     if success:
         if days == 0:
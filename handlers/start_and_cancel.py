@@ -1,6 +1,5 @@
 from aiogram import Router, F
 from aiogram.filters import CommandStart
-from database.database import get_db
 from phrases import FIRST_MESSAGE
 from services import SubscriptionService
 from keyboards import get_main_keyboard
@@ -10,12 +9,10 @@ router = Router()
 
 # Обработчик команды /start
 @router.message(CommandStart())
-async def cmd_start(message):
+async def cmd_start(message, session):
     """Обработчик команды /start"""
-    db = next(get_db())
-
-    SubscriptionService.get_or_create_user(
-        db,
+    await SubscriptionService.get_or_create_user(
+        session,
         message.from_user.id,
         username=message.from_user.username,
         first_name=message.from_user.first_name,
@@ -0,0 +1,65 @@
+from aiogram.filters import Command
+from cache import category_cache, render_cache
+from handlers import router
+
+PERIOD_NAMES = {
+    "weekly": "еженедельно",
+    "monthly": "ежемесячно",
+    "yearly": "ежегодно"
+}
+
+
+# Обработчик команды /stats
+@router.message(Command("stats"))
+async def cmd_stats(message, session):
+    """Обработчик команды /stats"""
+    telegram_id = message.from_user.id
+    response = render_cache.get(telegram_id, "stats")
+    if response is None:
+        # numpy загружается при первом запросе статистики, а не при запуске бота
+        from analytics import load_subscription_arrays, compute_stats
+
+        generation = render_cache.generation
+        stats = compute_stats(await load_subscription_arrays(session, telegram_id))
+        await category_cache.ensure_loaded(session)
+        response = render_stats(stats, category_cache.names)
+        render_cache.put(telegram_id, "stats", response, generation)
+
+    if not response:
+        await message.answer("У вас нет активных подписок.\n"
+                             "Добавьте подписку с помощью /add, чтобы увидеть статистику.")
+        return
+
+    await message.answer(response, parse_mode="Markdown")
+
+
+# Текст статистики расходов (пустая строка, если подписок нет)
+def render_stats(stats, category_names):
+    """Текст статистики расходов (пустая строка, если подписок нет)"""
+    if stats is None:
+        return ""
+
+    response = (
+        f"""*Статистика расходов*
+
+Активных подписок: {stats['count']}
+В месяц: *{stats['monthly']:.2f} рублей*
+В год: *{stats['yearly']:.2f} рублей*
+В среднем на подписку: {stats['average']:.2f} рублей в месяц
+Ближайший платеж: {stats['next_date'].strftime('%d.%m.%Y')}
+
+*По категориям:*\n"""
+    )
+    for category_id, monthly, share in stats["categories"]:
+        name = category_names.get(category_id, "Без категории")
+        response += f"{name}: {monthly:.2f} рублей в месяц ({share:.1f}%)\n"
+
+    response += "\n*Самые дорогие:*\n"
+    for i, (name, price, period, monthly) in enumerate(stats["top"], 1):
+        response += f"{i}. *{name}* - {price:.2f} рублей {PERIOD_NAMES[period]} ({monthly:.2f} в месяц)\n"
+
+    response += "\n*По периодичности:*\n"
+    for period, count, monthly in stats["periods"]:
+        response += f"{PERIOD_NAMES[period].capitalize()}: {count} шт., {monthly:.2f} рублей в месяц\n"
+
+    return response
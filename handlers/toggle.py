@@ -1,6 +1,5 @@
 from aiogram import F
 from aiogram.filters import Command
-from database.database import get_db
 from handlers import router
 from services import SubscriptionService
 
@@ -8,7 +7,7 @@ from services import SubscriptionService
 # Обработчик команды /toggle (Приостановка/возобновление подписки)
 @router.message(F.text == "Приостановка/возобновление подписки")
 @router.message(Command("toggle"))
-async def cmd_toggle(message):
+async def cmd_toggle(message, session):
     """Приостановка/возобновление подписки"""
     try:
         parts = message.text.split()
@@ -17,10 +16,8 @@ async def cmd_toggle(message):
             return
 
         subscription_id = int(parts[1])
-        db = next(get_db())
-
-        subscription = SubscriptionService.toggle_subscription(
-            db, subscription_id, message.from_user.id
+        subscription = await SubscriptionService.toggle_subscription(
+            session, subscription_id, message.from_user.id
         )
 
         if subscription:
@@ -0,0 +1,152 @@
+import logging
+import os
+import tempfile
+from time import perf_counter
+
+from aiogram import F
+from aiogram.filters import Command
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import FSInputFile
+from cache import category_cache
+from config import config
+from handlers import router
+from keyboards import get_main_keyboard, get_cancel_keyboard
+from phrases import IMPORT_TEXT
+from services import SubscriptionService
+from transfer import ExportWriter, detect_format, iter_records, open_text, parse_record
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "json")
+MAX_REPORTED_ERRORS = 10
+
+
+class ImportSubscriptions(StatesGroup):
+    waiting_for_file = State()
+
+
+# Обработчик команды /import
+@router.message(Command("import"))
+async def cmd_import(message, state, session):
+    """Обработчик команды /import"""
+    if message.document:
+        await import_document(message, session)
+        return
+
+    await message.answer(IMPORT_TEXT, parse_mode="Markdown", reply_markup=get_cancel_keyboard())
+    await state.set_state(ImportSubscriptions.waiting_for_file)
+
+
+# Обработка файла импорта
+@router.message(ImportSubscriptions.waiting_for_file, F.document)
+async def process_import_file(message, state, session):
+    """Обработка файла импорта"""
+    await state.clear()
+    await import_document(message, session)
+
+
+# Ожидание файла импорта
+@router.message(ImportSubscriptions.waiting_for_file)
+async def process_import_waiting(message):
+    """Ожидание файла импорта"""
+    await message.answer("Отправьте файл CSV или JSON или нажмите 'Отмена'")
+
+
+# Импорт подписок из присланного документа
+async def import_document(message, session):
+    """Импорт подписок из присланного документа
+
+    Файл скачивается во временный файл и разбирается потоково; ошибочные
+    записи пропускаются, остальные вставляются пачками в одной транзакции.
+    """
+    document = message.document
+    if document.file_size and document.file_size > config.IMPORT_MAX_BYTES:
+        await message.answer(f"Файл слишком большой. Максимум "
+                             f"{config.IMPORT_MAX_BYTES // (1024 * 1024)} МБ",
+                             reply_markup=get_main_keyboard())
+        return
+
+    await category_cache.ensure_loaded(session)
+    category_ids = {category.name.lower(): category.id for category in category_cache.categories}
+    errors = []
+    skipped = 0
+
+    def valid_rows(records):
+        nonlocal skipped
+        for number, record in records:
+            if number > config.IMPORT_MAX_ROWS:
+                raise ValueError(f"в файле больше {config.IMPORT_MAX_ROWS} записей")
+            try:
+                yield parse_record(record, category_ids)
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"запись {number}: {e}")
+
+    with tempfile.TemporaryFile() as file:
+        await message.bot.download(document, destination=file)
+        file.seek(0)
+        head = file.read(64).lstrip(b"\xef\xbb\xbf \t\r\n")
+        file.seek(0)
+        file_format = detect_format(document.file_name, head[:1].decode("latin-1"))
+
+        started = perf_counter()
+        try:
+            imported = await SubscriptionService.import_subscriptions(
+                session, message.from_user.id, valid_rows(iter_records(open_text(file), file_format)),
+                chunk_size=config.IMPORT_CHUNK_SIZE)
+        except (ValueError, UnicodeDecodeError) as e:
+            await session.rollback()
+            await message.answer(f"Импорт отменен, ничего не добавлено: {e}",
+                                 reply_markup=get_main_keyboard())
+            return
+        elapsed = perf_counter() - started
+
+    rate = (imported + skipped) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Импорт пользователя {message.from_user.id}: {imported} подписок, "
+                f"пропущено {skipped}, {elapsed:.2f} с ({rate:.0f} строк/с)")
+
+    response = (f"Импорт завершен\n\n"
+                f"Добавлено подписок: {imported}\n"
+                f"Пропущено записей: {skipped}\n"
+                f"Время: {elapsed:.2f} с ({rate:.0f} строк/с)")
+    if errors:
+        response += "\n\nОшибки:\n" + "\n".join(errors)
+        if skipped > len(errors):
+            response += f"\n... и еще {skipped - len(errors)}"
+    await message.answer(response, reply_markup=get_main_keyboard())
+
+
+# Обработчик команды /export
+@router.message(Command("export"))
+async def cmd_export(message, session):
+    """Обработчик команды /export"""
+    parts = message.text.split()
+    file_format = parts[1].lower() if len(parts) > 1 else "csv"
+    if file_format not in EXPORT_FORMATS:
+        await message.answer("Использование: /export [csv|json]\nПример: /export json")
+        return
+
+    started = perf_counter()
+    with tempfile.NamedTemporaryFile("w", suffix=f".{file_format}", encoding="utf-8",
+                                     newline="", delete=False) as file:
+        path = file.name
+        writer = ExportWriter(file, file_format)
+        async for row in SubscriptionService.iter_export_rows(session, message.from_user.id):
+            writer.write(row)
+        writer.close()
+    elapsed = perf_counter() - started
+
+    try:
+        if not writer.rows:
+            await message.answer("У вас пока нет подписок для экспорта")
+            return
+
+        rate = writer.rows / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Экспорт пользователя {message.from_user.id}: {writer.rows} подписок, "
+                    f"{elapsed:.2f} с ({rate:.0f} строк/с)")
+        await message.answer_document(
+            FSInputFile(path, filename=f"subscriptions.{file_format}"),
+            caption=f"Подписок: {writer.rows}, выгружено за {elapsed:.2f} с ({rate:.0f} строк/с)")
+    finally:
+        os.remove(path)
@@ -2,24 +2,39 @@ from datetime import datetime
 
 from aiogram import F
 from aiogram.filters import Command
-from database.database import get_db
 from services import SubscriptionService
+from cache import render_cache
 from handlers import router
 
 
 # Обработчик команды /upcoming
 @router.message(Command("upcoming"))
 @router.message(F.text == "Ближайшие платежи")
-async def cmd_upcoming(message):
+async def cmd_upcoming(message, session):
     """Обработчик команды /upcoming"""
-    db = next(get_db())
-    upcoming = SubscriptionService.get_upcoming_payments(db, message.from_user.id, days_ahead=14)
+    telegram_id = message.from_user.id
+    response = render_cache.get(telegram_id, "upcoming")
+    if response is None:
+        generation = render_cache.generation
+        upcoming = await SubscriptionService.get_upcoming_payments(session, telegram_id,
+                                                                   days_ahead=14)
+        response = render_upcoming(upcoming)
+        render_cache.put(telegram_id, "upcoming", response, generation)
 
-    if not upcoming:
+    if not response:
         await message.answer("В ближайшие 14 дней у вас нет предстоящих платежей",
                              parse_mode="Markdown")
         return
 
+    await message.answer(response, parse_mode="Markdown")
+
+
+# Текст ближайших платежей (пустая строка, если платежей нет)
+def render_upcoming(upcoming):
+    """Текст ближайших платежей (пустая строка, если платежей нет)"""
+    if not upcoming:
+        return ""
+
     response = "*Платежи в ближайшие 14 дней:*\n\n"
     today = datetime.now().date()
 
@@ -40,5 +55,5 @@ async def cmd_upcoming(message):
 ({days_until} {days_text})
 {category_name}\n\n"""
         )
-    await message.answer(response, parse_mode="Markdown")
-    db.close()
+    return response
+
@@ -1,3 +1,3 @@
 """Определение модуля всех клавиатур"""
 from .keyboards import get_main_keyboard, get_cancel_keyboard, get_categories_keyboard, \
-    get_billing_period_keyboard, get_notification_days_keyboard
+    get_billing_period_keyboard, get_notification_days_keyboard, get_list_keyboard
@@ -68,3 +68,26 @@ def get_notification_days_keyboard():
     builder.adjust(2)
     return builder.as_markup()
 
+
+# Клавиатура страницы списка подписок
+def get_list_keyboard(active, prev_cursor=None, next_cursor=None):
+    """Клавиатура страницы списка подписок
+
+    Курсоры - строки вида "<порядковый номер даты>_<id>" для callback_data.
+    """
+    status = "a" if active else "i"
+    builder = InlineKeyboardBuilder()
+    navigation = []
+    if prev_cursor:
+        navigation.append(InlineKeyboardButton(text="« Назад",
+                                               callback_data=f"list_{status}_p_{prev_cursor}"))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(text="Вперед »",
+                                               callback_data=f"list_{status}_n_{next_cursor}"))
+    if navigation:
+        builder.row(*navigation)
+    builder.row(InlineKeyboardButton(text=("• " if active else "") + "Активные",
+                                     callback_data="list_a"),
+                InlineKeyboardButton(text=("" if active else "• ") + "Неактивные",
+                                     callback_data="list_i"))
+    return builder.as_markup()
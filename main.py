@@ -1,18 +1,47 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from config import config
 from database import init_database
+from database.database import db
+from database.fsm_storage import SqliteStorage
 from handlers import router
+from metrics import start_metrics_server
+from middlewares import DbSessionMiddleware, CommitBeforeRequestMiddleware, MetricsMiddleware, HandlerNameMiddleware
 from scheduler import NotificationScheduler
+from webhook import run_webhook
 
 # Логи
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 
+# Создать бота (при TELEGRAM_API_URL - со своим сервером Bot API)
+def create_bot():
+    """Создать бота (при TELEGRAM_API_URL - со своим сервером Bot API)"""
+    session = None
+    if config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    bot = Bot(token=config.BOT_TOKEN, session=session)
+    bot.session.middleware(CommitBeforeRequestMiddleware())
+    return bot
+
+
+# Создать диспетчер с middleware и обработчиками
+def create_dispatcher(storage):
+    """Создать диспетчер с middleware и обработчиками"""
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(MetricsMiddleware())
+    dp.update.middleware(DbSessionMiddleware())
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    dp.include_router(router)
+    return dp
+
+
 # Основная функция запуска бота
 async def main():
     """Основная функция запуска бота"""
@@ -24,25 +53,39 @@ async def main():
         logger.error(f"Ошибка при инициализации базы данных: {e}")
         return
 
-    bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
-    dp.include_router(router)
+    bot = create_bot()
+    storage = SqliteStorage()
+    storage.start_sweeper()
+    dp = create_dispatcher(storage)
 
     scheduler = NotificationScheduler(bot)
     scheduler.start()
 
-    logger.info("Бот запущен")
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
+    logger.info(f"Бот запущен ({config.BOT_MODE})")
 
     try:
-        await dp.start_polling(bot)
+        if config.BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            # Вебхук остается зарегистрированным после BOT_MODE=webhook, и пока он есть,
+            # getUpdates отвечает 409 Conflict
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot)
     except KeyboardInterrupt:
         logger.info("Бот остановлен")
     except Exception as e:
         logger.error(f"Ошибка при работе бота: {e}")
     finally:
         scheduler.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await storage.close()
         await bot.session.close()
+        await db.async_engine.dispose()
         logger.info("Бот завершил работу")
 
 
@@ -50,5 +93,11 @@ if __name__ == "__main__":
     if not config.BOT_TOKEN:
         print("Ошибка: BOT_TOKEN не найден в .env файле. Создайте файл .env и добавьте токен")
         exit(1)
+    if config.BOT_MODE not in ("polling", "webhook"):
+        print(f"Ошибка: неизвестный BOT_MODE={config.BOT_MODE}, допустимо polling или webhook")
+        exit(1)
+    if config.BOT_MODE == "webhook" and not config.WEBHOOK_URL:
+        print("Ошибка: для BOT_MODE=webhook укажите WEBHOOK_URL в .env файле")
+        exit(1)
 
     asyncio.run(main())
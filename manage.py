@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+
+from database import get_async_db
+from database.database import db
+from services import SpendingService
+
+
+# Пересчет агрегатов расходов
+async def rebuild_spending(check_only):
+    """Пересчет агрегатов расходов
+
+    Сначала агрегаты сравниваются с полным пересчетом по подпискам и
+    расхождения выводятся; без --check агрегаты затем пересчитываются.
+    """
+    async with get_async_db() as session:
+        mismatches = await SpendingService.verify(session)
+        for user_id, category_id, stored, expected in mismatches[:20]:
+            scope = "итого" if category_id is None else f"категория {category_id}"
+            print(f"Пользователь {user_id} ({scope}): хранится {stored[0]:.2f}/{stored[1]:.2f}, "
+                  f"по подпискам {expected[0]:.2f}/{expected[1]:.2f}")
+        print(f"Расхождений: {len(mismatches)}")
+
+        if not check_only:
+            await SpendingService.rebuild(session)
+            print("Агрегаты расходов пересчитаны")
+    return 1 if check_only and mismatches else 0
+
+
+# Разбор аргументов и запуск команды
+async def main():
+    """Разбор аргументов и запуск команды"""
+    parser = argparse.ArgumentParser(description="Служебные команды бота")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-spending", help="проверить и пересчитать агрегаты расходов")
+    rebuild.add_argument("--check", action="store_true", help="только проверить, не пересчитывая")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "rebuild-spending":
+            return await rebuild_spending(args.check)
+    finally:
+        await db.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    exit(asyncio.run(main()))
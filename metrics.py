@@ -0,0 +1,209 @@
+"""Метрики обработки апдейтов в текстовом формате Prometheus"""
+import bisect
+import logging
+from contextvars import ContextVar
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class UpdateStats:
+    """Обработчик и запросы к БД текущего апдейта"""
+
+    __slots__ = ("handler", "statements", "db_time", "shapes")
+
+    def __init__(self):
+        self.handler = "unhandled"
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes = {}  # текст запроса -> число выполнений (при QUERY_DEBUG)
+
+
+# Статистика апдейта, который обрабатывает текущая задача; вне апдейтов - None
+current_stats: ContextVar = ContextVar("current_stats", default=None)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.values = {}
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + value
+
+    def get(self, **labels):
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels_text(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин и метками"""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.series = {}  # метки -> [счетчики корзин, сумма, количество]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    # Оценка квантиля по корзинам (как histogram_quantile в Prometheus)
+    def quantile(self, fraction, **labels):
+        """Оценка квантиля по корзинам (как histogram_quantile в Prometheus)"""
+        series = self.series.get(tuple(sorted(labels.items())))
+        if not series or not series[2]:
+            return 0.0
+        counts, _, total = series
+        rank = fraction * total
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        # Квантиль попал выше последней границы
+        return self.buckets[-1]
+
+    def label_sets(self):
+        return [dict(key) for key in self.series]
+
+    def count(self, **labels):
+        series = self.series.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    def sum(self, **labels):
+        series = self.series.get(tuple(sorted(labels.items())))
+        return series[1] if series else 0.0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels_text(key + (('le', f'{upper:g}'),))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_bucket{_labels_text(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels_text(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels_text(key)} {count}")
+        return lines
+
+
+class BotMetrics:
+    """Метрики бота: время обработчиков и запросы к БД
+
+    Заполняются MetricsMiddleware (по апдейтам) и хуками курсора
+    SQLAlchemy (database.instrumentation); хранятся в памяти процесса.
+    """
+
+    def __init__(self):
+        self.updates = Counter("bot_updates_total", "Обработанные апдейты")
+        self.handler_seconds = Histogram(
+            "bot_handler_duration_seconds", "Время обработки апдейта", LATENCY_BUCKETS)
+        self.handler_statements = Histogram(
+            "bot_handler_db_statements", "SQL-запросов на апдейт", STATEMENT_BUCKETS)
+        self.handler_db_seconds = Histogram(
+            "bot_handler_db_duration_seconds", "Время запросов к БД на апдейт", LATENCY_BUCKETS)
+        self.db_statements = Counter("bot_db_statements_total", "Выполненные SQL-запросы")
+        self.db_seconds = Counter("bot_db_duration_seconds_total", "Время SQL-запросов")
+
+    # Учесть выполненный SQL-запрос
+    def observe_statement(self, elapsed):
+        """Учесть выполненный SQL-запрос (в апдейте или в фоновой задаче)"""
+        stats = current_stats.get()
+        source = "update" if stats is not None else "background"
+        self.db_statements.inc(source=source)
+        self.db_seconds.inc(elapsed, source=source)
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += elapsed
+
+    # Учесть обработанный апдейт
+    def observe_update(self, stats, elapsed, status="ok"):
+        """Учесть обработанный апдейт"""
+        self.updates.inc(handler=stats.handler, status=status)
+        self.handler_seconds.observe(elapsed, handler=stats.handler)
+        self.handler_statements.observe(stats.statements, handler=stats.handler)
+        self.handler_db_seconds.observe(stats.db_time, handler=stats.handler)
+
+    # Сводка по обработчикам для команды /metrics
+    def summary(self):
+        """Сводка по обработчикам: число вызовов, p50/p95, запросы и время БД"""
+        rows = []
+        for labels in self.handler_seconds.label_sets():
+            count = self.handler_seconds.count(**labels)
+            rows.append({
+                "handler": labels["handler"],
+                "count": count,
+                "errors": self.updates.get(handler=labels["handler"], status="error"),
+                "p50": self.handler_seconds.quantile(0.5, **labels),
+                "p95": self.handler_seconds.quantile(0.95, **labels),
+                "statements": self.handler_statements.sum(**labels) / count,
+                "db_time": self.handler_db_seconds.sum(**labels) / count,
+            })
+        return sorted(rows, key=lambda row: row["count"], reverse=True)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in (self.updates, self.handler_seconds, self.handler_statements,
+                       self.handler_db_seconds, self.db_statements, self.db_seconds):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = BotMetrics()
+
+
+# Запустить HTTP-сервер с метриками для Prometheus
+async def start_metrics_server(host, port):
+    """Запустить HTTP-сервер с метриками для Prometheus (GET /metrics)
+
+    Если порт занят, ошибка пишется в журнал, бот работает без эндпоинта и
+    функция возвращает None.
+    """
+
+    async def handle(request):
+        return web.Response(body=metrics.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+    except OSError as e:
+        logger.error(f"Не удалось запустить эндпоинт метрик на {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
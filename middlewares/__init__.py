@@ -0,0 +1,3 @@
+"""Определение модуля всех middleware"""
+from .database import DbSessionMiddleware, CommitBeforeRequestMiddleware
+from .metrics import MetricsMiddleware, HandlerNameMiddleware
@@ -0,0 +1,64 @@
+import logging
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from database.database import db, current_session
+
+logger = logging.getLogger(__name__)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Одна сессия БД на апдейт
+
+    Сессия передается обработчику аргументом session и доступна через
+    current_session. В конце апдейта изменения фиксируются commit, при
+    ошибке откатываются; сессия закрывается всегда. Перед каждым запросом к
+    Bot API сессию фиксирует CommitBeforeRequestMiddleware, поэтому
+    откатываются только изменения после последнего ответа бота.
+    """
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or db.AsyncSessionLocal
+
+    async def __call__(self, handler, event, data):
+        try:
+            async with self.session_factory() as session:
+                token = current_session.set(session)
+                session.info["update"] = True
+                data["session"] = session
+                try:
+                    result = await handler(event, data)
+                    await session.commit()
+                    return result
+                except Exception:
+                    await session.rollback()
+                    raise
+                finally:
+                    current_session.reset(token)
+        finally:
+            self._log_pool_status()
+
+    @staticmethod
+    def _log_pool_status():
+        status = db.pool_status()
+        logger.debug(f"Пул соединений: {status}")
+        # Соединения сверх size (до max_overflow) - обычная работа под нагрузкой; когда
+        # занят весь лимит уже после закрытия своей сессии, новые апдейты ждут соединение
+        limit = status["size"] + status["max_overflow"]
+        if status["size"] and status["in_use"] >= limit:
+            logger.warning(f"Пул соединений исчерпан: занято {status['in_use']} "
+                           f"при лимите {limit} ({status['size']} + {status['max_overflow']})")
+
+
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    """Фиксировать сессию апдейта перед запросом к Bot API
+
+    Иначе транзакция записи SQLite остается открытой на время сетевого
+    запроса, и остальные апдейты ждут блокировку до busy_timeout. Сессии
+    задач планировщика не трогаются: они фиксируют изменения сами.
+    """
+
+    async def __call__(self, make_request, bot, method):
+        session = current_session.get()
+        if session is not None and session.info.get("update") and session.in_transaction():
+            await session.commit()
+        return await make_request(bot, method)
@@ -0,0 +1,44 @@
+import time
+from aiogram import BaseMiddleware
+from database.instrumentation import check_repeated_queries
+from metrics import metrics, current_stats, UpdateStats
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Время обработки апдейта и запросы к БД по обработчикам
+
+    Подключается как outer middleware апдейта, чтобы в замер попали и
+    commit сессии DbSessionMiddleware, и апдейты без подходящего обработчика.
+    Имя обработчика записывает HandlerNameMiddleware. После успешной
+    обработки проверяются повторяющиеся запросы (QUERY_DEBUG).
+    """
+
+    async def __call__(self, handler, event, data):
+        stats = UpdateStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            result = await handler(event, data)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            current_stats.reset(token)
+            metrics.observe_update(stats, time.perf_counter() - started, status)
+        check_repeated_queries(stats)
+        return result
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Запоминает имя выбранного обработчика для MetricsMiddleware
+
+    Подключается как inner middleware событий: вызывается только после того,
+    как фильтры выбрали обработчик.
+    """
+
+    async def __call__(self, handler, event, data):
+        stats = current_stats.get()
+        if stats is not None and "handler" in data:
+            stats.handler = data["handler"].callback.__name__
+        return await handler(event, data)
@@ -28,6 +28,10 @@ HELP_TEXT = (
 /add - добавить подписку
 /list - мои подписки
 /upcoming - ближайшие платежи
+/stats - статистика расходов
+/forecast - прогноз платежей на несколько месяцев
+/import - загрузить подписки из файла CSV или JSON
+/export - выгрузить подписки в файл (/export json)
 /notify - настройка уведомлений
 /help - помощь
 /toggle - включение/выключение подписки
@@ -45,6 +49,7 @@ HELP_TEXT = (
 *Примеры команд:*
 /subscription добавить \"Мобильный интернет\" 399 25 - добавить подписку \"Мобильный интернет\" за 399 рублей с оплатой 25-го числа
 /notify 3 - уведомлять за 3 дня
+/forecast 6 - платежи на 6 месяцев вперед
 /category развлечения - установить категорию развлечения"""
 )
 
@@ -54,3 +59,19 @@ ADD_TEXT = (
 Введите название подписки (например: Яндекс.Плюс, Spotify):
 Или нажмите 'Отмена' для выхода"""
 )
+
+IMPORT_TEXT = (
+    """*Импорт подписок*
+
+Отправьте файл CSV, JSON (массив объектов) или JSON Lines.
+Поля: `name`, `price`, `payment_day` - обязательные,
+`billing_period` (monthly, yearly, weekly), `category`, `next_payment_date` (ГГГГ-ММ-ДД),
+`is_active` (true/false) - необязательные.
+
+Пример CSV:
+`name,price,payment_day,billing_period,category`
+`Spotify,199,5,monthly,Музыка`
+
+Файл из /export можно загрузить обратно без изменений.
+Или нажмите 'Отмена' для выхода"""
+)
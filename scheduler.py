@@ -1,10 +1,16 @@
-from datetime import datetime
+import asyncio
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from time import perf_counter
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 import logging
-from database import get_db
+from database import get_async_db
+from database.instrumentation import tracked_job
 from services import SubscriptionService, NotificationService
 from config import config
+from sender import MessageSender, OutgoingMessage
+from cache import render_cache
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +18,8 @@ logger = logging.getLogger(__name__)
 class NotificationScheduler:
     def __init__(self, bot):
         self.bot = bot
+        self.sender = MessageSender(bot)
+        self.drain_lock = asyncio.Lock()
         self.scheduler = AsyncIOScheduler()
 
     # Запуск планировщика
@@ -21,6 +29,10 @@ class NotificationScheduler:
                                CronTrigger(hour=config.NOTIFICATION_HOUR, minute=0),
                                id="daily_notifications")
 
+        # Досылка напоминаний, не отправленных до перезапуска
+        self.scheduler.add_job(self.drain_notifications, next_run_time=datetime.now(),
+                               id="drain_notifications")
+
         self.scheduler.add_job(self.update_payment_dates, CronTrigger(hour=0, minute=0),
                                id="update_payment_dates")
         self.scheduler.add_job(self.send_monthly_report, CronTrigger(day=1, hour=9, minute=0),
@@ -29,83 +41,129 @@ class NotificationScheduler:
         logger.info("Планировщик уведомлений запущен")
 
     # Отправка ежедневных уведомлений
+    @tracked_job
     async def send_daily_notifications(self):
         """Отправка ежедневных уведомлений"""
         logger.info("Отправка ежедневных уведомлений...")
-        db = next(get_db())
+        scheduled_for = datetime.combine(date.today(), time(hour=config.NOTIFICATION_HOUR))
 
         try:
-            subscriptions = NotificationService.get_subscriptions_for_notification(db)
-
-            if not subscriptions:
-                logger.info("Нет подписок для уведомлений")
-                return
-
-            logger.info(f"Найдено {len(subscriptions)} подписок для уведомлений")
-
-            for subscription in subscriptions:
-                try:
-                    message = NotificationService.format_notification_message(subscription)
-                    await self.bot.send_message(chat_id=subscription.user.telegram_id, text=message,
-                                                parse_mode="Markdown")
-                    logger.info(
-                        f"Уведомление отправлено пользователю {subscription.user.telegram_id}")
-
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке уведомления: {e}")
-
+            async with get_async_db() as db:
+                count = await NotificationService.enqueue_notifications(db, scheduled_for)
+            logger.info(f"Найдено {count} подписок для напоминаний на {scheduled_for:%d.%m.%Y}")
         except Exception as e:
             logger.error(f"Ошибка при получении подписок для уведомлений: {e}")
-        finally:
-            db.close()
+
+        await self.drain_notifications()
+
+    # Отправка накопленных в очереди напоминаний
+    @tracked_job
+    async def drain_notifications(self):
+        """Отправка накопленных в очереди напоминаний
+
+        Напоминания отмечаются отправленными после каждой пачки, поэтому после
+        перезапуска (в том числе на следующий день) отправка продолжается с
+        первого неотправленного напоминания, а не удавшиеся вчера досылаются.
+        Напоминания старше NOTIFICATION_MAX_AGE_HOURS, а также по подпискам,
+        которые после постановки в очередь перестали подходить
+        (is_notification_current), закрываются без отправки. Текст (в том числе
+        «Осталось дней») собирается заново в момент отправки.
+        """
+        async with self.drain_lock:
+            until = datetime.now()
+            since = until - timedelta(hours=config.NOTIFICATION_MAX_AGE_HOURS)
+            after_user_id = 0
+            try:
+                async with get_async_db() as db:
+                    expired = await NotificationService.expire_notifications(db, since)
+                    if expired:
+                        logger.warning(f"Устаревших напоминаний закрыто без отправки: {expired} "
+                                       f"(запланированы раньше {since:%d.%m.%Y %H:%M})")
+
+                    while True:
+                        notifications = await NotificationService.get_pending_notifications(
+                            db, since, until, after_user_id, users_limit=config.OUTBOX_BATCH_USERS)
+                        if not notifications:
+                            break
+                        after_user_id = notifications[-1].user_id
+
+                        today = date.today()
+                        stale = {notification.id for notification in notifications
+                                 if not NotificationService.is_notification_current(
+                                     notification, today)}
+                        if stale:
+                            await NotificationService.skip_notifications(db, list(stale))
+                            logger.info(f"Неактуальных напоминаний закрыто без отправки: "
+                                        f"{len(stale)}")
+                            notifications = [notification for notification in notifications
+                                             if notification.id not in stale]
+
+                        # Пачка отсортирована по пользователю: одна сводка на пользователя
+                        messages = []
+                        for _, user_notifications in groupby(notifications,
+                                                             key=lambda n: n.user_id):
+                            user_notifications = list(user_notifications)
+                            chunks = NotificationService.build_digest_chunks(
+                                [NotificationService.format_digest_item(notification.subscription)
+                                 for notification in user_notifications])
+                            for text, indexes in chunks:
+                                messages.append(OutgoingMessage(
+                                    chat_id=user_notifications[0].user.telegram_id, text=text,
+                                    payload=[user_notifications[index].id for index in indexes]))
+
+                        stats = await self.sender.send_all(messages,
+                                                           title="Ежедневные уведомления")
+                        await NotificationService.mark_notifications_sent(
+                            db, [notification_id for ids in stats.delivered
+                                 for notification_id in ids])
+
+            except Exception as e:
+                logger.error(f"Ошибка при отправке напоминаний из очереди: {e}")
 
     # Обновление дат платежей
+    @tracked_job
     async def update_payment_dates(self):
         """Обновление дат платежей"""
         logger.info("Обновление дат платежей...")
-        db = next(get_db())
+        started = perf_counter()
         try:
-            SubscriptionService.update_next_payment_dates(db)
-            logger.info("Даты платежей обновлены")
+            async with get_async_db() as db:
+                advanced = await SubscriptionService.update_next_payment_dates(db)
+            # Новые даты платежей и новый день: готовые ответы /list и /upcoming устарели
+            render_cache.clear()
+            logger.info(f"Даты платежей обновлены: {advanced} подписок "
+                        f"за {perf_counter() - started:.2f} с")
         except Exception as e:
             logger.error(f"Ошибка при обновлении дат платежей: {e}")
-        finally:
-            db.close()
 
     # Отправка ежемесячного отчета
+    @tracked_job
     async def send_monthly_report(self):
         """Отправка ежемесячного отчета"""
         logger.info("Отправка ежемесячного отчета...")
-        db = next(get_db())
         try:
-            from database.models import User
-            users = db.query(User).all()
-
-            for user in users:
-                try:
-                    totals = SubscriptionService.calculate_totals(db, user.telegram_id)
-                    if totals['monthly'] == 0:
-                        continue
-
+            async with get_async_db() as db:
+                month = datetime.now().strftime('%B %Y')
+                messages = []
+                async for telegram_id, monthly, yearly in SubscriptionService.iter_all_totals(db):
                     report = (
                         f"*Ежемесячный отчет по подпискам*\n\n"
-                        f"*Расходы за месяц:* {totals['monthly']:.2f} RUB\n"
-                        f"*Расходы за год:* {totals['yearly']:.2f} RUB\n\n"
-                        f"Отчет за {datetime.now().strftime('%B %Y')}.\n"
+                        f"*Расходы за месяц:* {monthly:.2f} RUB\n"
+                        f"*Расходы за год:* {yearly:.2f} RUB\n\n"
+                        f"Отчет за {month}.\n"
                         "Используйте /stats для подробной статистики."
                     )
+                    messages.append(OutgoingMessage(chat_id=telegram_id, text=report))
 
-                    await self.bot.send_message(chat_id=user.telegram_id, text=report,
-                                                parse_mode="Markdown")
-                    logger.info(f"Ежемесячный отчет отправлен пользователю {user.telegram_id}")
+                    # Отправляем пачками, чтобы не держать в памяти отчеты всех пользователей
+                    if len(messages) >= config.REPORT_BATCH_SIZE:
+                        await self.sender.send_all(messages, title="Ежемесячный отчет")
+                        messages = []
 
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке отчета пользователю {user.telegram_id}: {e}")
+                await self.sender.send_all(messages, title="Ежемесячный отчет")
 
         except Exception as e:
             logger.error(f"Ошибка при отправке ежемесячного отчета: {e}")
-        finally:
-            db.close()
 
     # Остановка планировщика
     def shutdown(self):
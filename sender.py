@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых сообщение стоит отправить повторно
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """Ограничитель частоты: не больше rate операций в секунду с запасом capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    # Дождаться свободного токена
+    async def acquire(self):
+        """Дождаться свободного токена"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    parse_mode: str = "Markdown"
+    payload: object = None  # возвращается в SendStats.delivered после успешной отправки
+    attempts: int = 0
+
+
+@dataclass
+class SendStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    rate_limited: int = 0
+    delivered: list = field(default_factory=list)
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float = 0.0
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def log(self, title):
+        """Записать итоги отправки в лог"""
+        elapsed = self.elapsed
+        rate = self.sent / elapsed if elapsed > 0 else 0.0
+        logger.info(f"{title}: отправлено {self.sent}/{self.total}, ошибок {self.failed}, "
+                    f"повторов {self.retried}, ограничений Telegram {self.rate_limited}, "
+                    f"{elapsed:.2f} с ({rate:.1f} сообщ./с)")
+
+
+class MessageSender:
+    """Конкурентная отправка сообщений с учетом лимитов Bot API
+
+    Общий лимит держится токен-бакетом, для каждого чата выдерживается
+    минимальный интервал. RetryAfter приостанавливает все отправки на указанное
+    время, сетевые ошибки повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(self, bot, rate=config.SEND_RATE_LIMIT, chat_interval=config.SEND_CHAT_INTERVAL,
+                 concurrency=config.SEND_CONCURRENCY, max_retries=config.SEND_MAX_RETRIES):
+        self.bot = bot
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    # Отправить все сообщения и вернуть статистику
+    async def send_all(self, messages, title="Рассылка"):
+        """Отправить все сообщения и вернуть статистику"""
+        run = _SendRun(self, messages)
+        stats = await run.execute()
+        stats.log(title)
+        return stats
+
+
+class _SendRun:
+    """Состояние одного запуска рассылки"""
+
+    def __init__(self, sender, messages):
+        self.sender = sender
+        self.bucket = TokenBucket(sender.rate)
+        self.queue = asyncio.Queue()
+        self.stats = SendStats()
+        self.chat_ready_at = {}
+        self.in_flight = set()  # чаты, сообщение в которые ждет токен или отправляется
+        self.paused_until = 0.0
+        self.pending = 0
+        self.done = asyncio.Event()
+
+        for message in messages:
+            self.queue.put_nowait(message)
+            self.pending += 1
+        self.stats.total = self.pending
+
+    async def execute(self):
+        if not self.pending:
+            self.stats.finished_at = time.monotonic()
+            return self.stats
+
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.sender.concurrency)]
+        try:
+            await self.done.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.stats.finished_at = time.monotonic()
+        return self.stats
+
+    def _finish(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.done.set()
+
+    def _requeue(self, message, delay):
+        asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, message)
+
+    async def _worker(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self._process(message)
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, message):
+        now = time.monotonic()
+        wait = max(self.paused_until, self.chat_ready_at.get(message.chat_id, 0.0)) - now
+        if message.chat_id in self.in_flight:
+            wait = max(wait, self.sender.chat_interval, 1 / self.sender.rate)
+        if wait > 0:
+            self._requeue(message, wait)
+            return
+
+        self.in_flight.add(message.chat_id)
+        try:
+            await self.bucket.acquire()
+            # Пауза после 429 могла начаться, пока сообщение ждало токен
+            while self.paused_until > time.monotonic():
+                await asyncio.sleep(self.paused_until - time.monotonic())
+            # Интервал отсчитывается от фактической отправки: токена можно ждать долго
+            self.chat_ready_at[message.chat_id] = time.monotonic() + self.sender.chat_interval
+            await self._send(message)
+        finally:
+            self.in_flight.discard(message.chat_id)
+
+    async def _send(self, message):
+        try:
+            await self.sender.bot.send_message(chat_id=message.chat_id, text=message.text,
+                                               parse_mode=message.parse_mode)
+        except TelegramRetryAfter as e:
+            self.stats.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after)
+            self._retry(message, e.retry_after, e)
+        except TRANSIENT_ERRORS as e:
+            delay = min(60.0, 2 ** message.attempts) + random.uniform(0, 0.5)
+            self._retry(message, delay, e)
+        except Exception as e:
+            self.stats.failed += 1
+            logger.error(f"Ошибка при отправке сообщения пользователю {message.chat_id}: {e}")
+            self._finish()
+        else:
+            self.stats.sent += 1
+            if message.payload is not None:
+                self.stats.delivered.append(message.payload)
+            logger.debug(f"Сообщение отправлено пользователю {message.chat_id}")
+            self._finish()
+
+    def _retry(self, message, delay, error):
+        message.attempts += 1
+        if message.attempts > self.sender.max_retries:
+            self.stats.failed += 1
+            logger.error(f"Не удалось отправить сообщение пользователю {message.chat_id} "
+                         f"после {self.sender.max_retries} повторов: {error}")
+            self._finish()
+            return
+
+        self.stats.retried += 1
+        logger.warning(f"Повтор отправки пользователю {message.chat_id} через {delay:.1f} с: {error}")
+        self._requeue(message, delay)
@@ -1,14 +1,92 @@
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 import calendar
-from database.models import User, Subscription, Category
+from sqlalchemy import select, func, case, update, delete, insert, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager, joinedload
+from config import config
+from cache import render_cache
+from database.models import User, Subscription, Category, Notification, UserSpending, \
+    CategorySpending
+
+MAX_NOTIFICATION_DAYS = 30
+
+
+class CostNormalizer:
+    """Приведение цены подписки к стоимости в месяц и в год
+
+    Единственное место с множителями периодов: те же правила доступны для
+    одной подписки в Python и как SQL-выражение CASE для агрегатов в БД.
+    Неизвестный период считается ежемесячным.
+    """
+
+    # Множители (в месяц, в год) по периоду оплаты
+    FACTORS = {
+        "monthly": (1.0, 12.0),
+        "yearly": (1 / 12, 1.0),
+        "weekly": (4.33, 52.0),
+    }
+    DEFAULT_PERIOD = "monthly"
+
+    # Множители для периода оплаты
+    @staticmethod
+    def factors(billing_period):
+        """Множители для периода оплаты"""
+        return CostNormalizer.FACTORS.get(billing_period,
+                                          CostNormalizer.FACTORS[CostNormalizer.DEFAULT_PERIOD])
+
+    # Стоимость в месяц и в год
+    @staticmethod
+    def costs(price, billing_period):
+        """Стоимость в месяц и в год"""
+        monthly, yearly = CostNormalizer.factors(billing_period)
+        return price * monthly, price * yearly
+
+    # Стоимость в месяц
+    @staticmethod
+    def monthly(price, billing_period):
+        """Стоимость в месяц"""
+        return price * CostNormalizer.factors(billing_period)[0]
+
+    # Стоимость в год
+    @staticmethod
+    def yearly(price, billing_period):
+        """Стоимость в год"""
+        return price * CostNormalizer.factors(billing_period)[1]
+
+    # SQL-выражение стоимости в месяц (column=0) или в год (column=1)
+    @staticmethod
+    def _sql(column, price, billing_period):
+        default = CostNormalizer.FACTORS[CostNormalizer.DEFAULT_PERIOD][column]
+        return price * case(*((billing_period == period, factors[column])
+                              for period, factors in CostNormalizer.FACTORS.items()
+                              if period != CostNormalizer.DEFAULT_PERIOD),
+                            else_=default)
+
+    # SQL-выражение стоимости в месяц
+    @staticmethod
+    def monthly_sql(price=Subscription.price, billing_period=Subscription.billing_period):
+        """SQL-выражение стоимости в месяц"""
+        return CostNormalizer._sql(0, price, billing_period)
+
+    # SQL-выражение стоимости в год
+    @staticmethod
+    def yearly_sql(price=Subscription.price, billing_period=Subscription.billing_period):
+        """SQL-выражение стоимости в год"""
+        return CostNormalizer._sql(1, price, billing_period)
 
 
 class SubscriptionService:
+    """Операции с пользователями и подписками
+
+    Методы, вызываемые из обработчиков, только сбрасывают изменения (flush):
+    транзакцию фиксирует DbSessionMiddleware в конце апдейта.
+    """
+
     # Получить пользователя или создать нового
     @staticmethod
-    def get_or_create_user(session, telegram_id, **kwargs):
+    async def get_or_create_user(session, telegram_id, **kwargs):
         """Получить пользователя или создать нового"""
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
+        user = await SubscriptionService.get_user(session, telegram_id)
         if not user:
             user = User(
                 telegram_id=telegram_id,
@@ -18,17 +96,22 @@ class SubscriptionService:
                 notification_days=3
             )
             session.add(user)
-            session.commit()
-            session.refresh(user)
+            await session.flush()
         return user
 
+    # Получить пользователя по Telegram ID
+    @staticmethod
+    async def get_user(session, telegram_id):
+        """Получить пользователя по Telegram ID"""
+        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+        return result.scalar_one_or_none()
+
     # Добавить новую подписку
     @staticmethod
-    def add_subscription(session, user_id, name, price, payment_day,
-                         billing_period="monthly", category_id=None,
-                         description=None):
+    async def add_subscription(session, user_id, name, price, payment_day,
+                               billing_period="monthly", category_id=None):
         """Добавить новую подписку"""
-        user = session.query(User).filter(User.telegram_id == user_id).first()
+        user = await SubscriptionService.get_user(session, user_id)
         if not user:
             raise ValueError("Пользователь не найден")
 
@@ -41,12 +124,12 @@ class SubscriptionService:
             payment_day=payment_day,
             billing_period=billing_period,
             category_id=category_id,
-            description=description,
             next_payment_date=next_payment
         )
         session.add(subscription)
-        session.commit()
-        session.refresh(subscription)
+        await session.flush()
+        await SpendingService.apply(session, subscription)
+        render_cache.mark_changed(session, user_id)
         return subscription
 
     # Рассчитать следующую дату платежа
@@ -76,38 +159,71 @@ class SubscriptionService:
 
     # Получить все подписки пользователя
     @staticmethod
-    def get_user_subscriptions(session, telegram_id, active_only=True):
+    async def get_user_subscriptions(session, telegram_id, active_only=True):
         """Получить все подписки пользователя"""
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
-            return []
-
-        query = session.query(Subscription).filter(Subscription.user_id == user.id)
+        query = select(Subscription).join(Subscription.user) \
+            .options(joinedload(Subscription.category)) \
+            .where(User.telegram_id == telegram_id)
         if active_only:
-            query = query.filter(Subscription.is_active == True)
+            query = query.where(Subscription.is_active == True)
 
-        return query.order_by(Subscription.next_payment_date).all()
+        result = await session.execute(query.order_by(Subscription.next_payment_date))
+        return result.scalars().all()
+
+    # Получить страницу подписок пользователя
+    @staticmethod
+    async def get_subscriptions_page(session, telegram_id, active=True, after=None, before=None,
+                                     limit=10):
+        """Получить страницу подписок пользователя
+
+        Пагинация по ключу (next_payment_date, id): after - ключ последней
+        подписки предыдущей страницы, before - ключ первой подписки следующей.
+        Читается limit + 1 строк, чтобы узнать, есть ли страница дальше.
+        Возвращает (подписки по возрастанию ключа, есть ли еще страница в
+        направлении чтения).
+        """
+        key = tuple_(Subscription.next_payment_date, Subscription.id)
+        query = select(Subscription).join(Subscription.user) \
+            .options(joinedload(Subscription.category)) \
+            .where(User.telegram_id == telegram_id, Subscription.is_active == active)
+
+        if before is not None:
+            query = query.where(key < tuple_(*before)) \
+                .order_by(Subscription.next_payment_date.desc(), Subscription.id.desc())
+        else:
+            if after is not None:
+                query = query.where(key > tuple_(*after))
+            query = query.order_by(Subscription.next_payment_date, Subscription.id)
+
+        result = await session.execute(query.limit(limit + 1))
+        subscriptions = list(result.scalars().all())
+        has_more = len(subscriptions) > limit
+        subscriptions = subscriptions[:limit]
+        if before is not None:
+            subscriptions.reverse()
+        return subscriptions, has_more
 
     # Получить подписку по ID
     @staticmethod
-    def get_subscription_by_id(session, subscription_id, user_id):
+    async def get_subscription_by_id(session, subscription_id, user_id):
         """Получить подписку по ID"""
-        user = session.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
-            return None
-
-        return session.query(Subscription).filter(Subscription.id == subscription_id,
-                                                  Subscription.user_id == user.id).first()
+        result = await session.execute(
+            select(Subscription).join(Subscription.user)
+            .options(joinedload(Subscription.category))
+            .where(Subscription.id == subscription_id, User.telegram_id == user_id))
+        return result.scalar_one_or_none()
 
     # Обновить подписку
     @staticmethod
-    def update_subscription(session, subscription_id, user_id, **kwargs):
+    async def update_subscription(session, subscription_id, user_id, **kwargs):
         """Обновить подписку"""
-        subscription = SubscriptionService.get_subscription_by_id(session, subscription_id, user_id)
+        subscription = await SubscriptionService.get_subscription_by_id(session, subscription_id,
+                                                                        user_id)
 
         if not subscription:
             return None
 
+        await SpendingService.apply(session, subscription, sign=-1)
         for key, value in kwargs.items():
             if hasattr(subscription, key):
                 setattr(subscription, key, value)
@@ -115,165 +231,414 @@ class SubscriptionService:
         if 'payment_day' in kwargs:
             subscription.next_payment_date = SubscriptionService._calculate_next_payment_date(subscription.payment_day)
 
-        session.commit()
-        session.refresh(subscription)
-
+        await session.flush()
+        await SpendingService.apply(session, subscription)
+        render_cache.mark_changed(session, user_id)
         return subscription
 
     # Удалить подписку
     @staticmethod
-    def delete_subscription(session, subscription_id, user_id):
+    async def delete_subscription(session, subscription_id, user_id):
         """Удалить подписку"""
-        subscription = SubscriptionService.get_subscription_by_id(session, subscription_id, user_id)
+        subscription = await SubscriptionService.get_subscription_by_id(session, subscription_id,
+                                                                        user_id)
 
         if not subscription:
             return False
 
-        session.delete(subscription)
-        session.commit()
+        await SpendingService.apply(session, subscription, sign=-1)
+        await session.delete(subscription)
+        await session.flush()
+        render_cache.mark_changed(session, user_id)
         return True
 
     # Включить/выключить подписку
     @staticmethod
-    def toggle_subscription(session, subscription_id, user_id):
+    async def toggle_subscription(session, subscription_id, user_id):
         """Включить/выключить подписку"""
-        subscription = SubscriptionService.get_subscription_by_id(session, subscription_id, user_id)
+        subscription = await SubscriptionService.get_subscription_by_id(session, subscription_id,
+                                                                        user_id)
 
         if not subscription:
             return None
 
         subscription.is_active = not subscription.is_active
-        session.commit()
-        session.refresh(subscription)
+        await session.flush()
+        await SpendingService.apply(session, subscription, sign=1 if subscription.is_active else -1,
+                                    force=True)
+        render_cache.mark_changed(session, user_id)
         return subscription
 
+    # Импортировать подписки пачками
+    @staticmethod
+    async def import_subscriptions(session, telegram_id, rows, chunk_size=500):
+        """Импортировать подписки пачками
+
+        rows - итератор проверенных записей (transfer.parse_record), читается
+        по мере вставки. Строки пишутся пакетными INSERT по chunk_size в текущей
+        транзакции, агрегаты расходов обновляются один раз в конце.
+        Возвращает число импортированных подписок.
+        """
+        user = await SubscriptionService.get_user(session, telegram_id)
+        if not user:
+            raise ValueError("Пользователь не найден")
+
+        imported = 0
+        deltas = {}
+        chunk = []
+        for row in rows:
+            if row["next_payment_date"] is None:
+                row["next_payment_date"] = SubscriptionService._calculate_next_payment_date(
+                    row["payment_day"])
+            row["user_id"] = user.id
+            chunk.append(row)
+
+            if row["is_active"]:
+                monthly, yearly = CostNormalizer.costs(row["price"], row["billing_period"])
+                category_monthly, category_yearly = deltas.get(row["category_id"] or 0, (0.0, 0.0))
+                deltas[row["category_id"] or 0] = (category_monthly + monthly,
+                                                   category_yearly + yearly)
+
+            if len(chunk) >= chunk_size:
+                await session.execute(insert(Subscription), chunk)
+                imported += len(chunk)
+                chunk = []
+
+        if chunk:
+            await session.execute(insert(Subscription), chunk)
+            imported += len(chunk)
+
+        await SpendingService.add(session, user.id, deltas)
+        if imported:
+            render_cache.mark_changed(session, telegram_id)
+        return imported
+
+    # Потоково получить подписки пользователя для экспорта
+    @staticmethod
+    async def iter_export_rows(session, telegram_id, batch_size=500):
+        """Потоково получить подписки пользователя для экспорта
+
+        Строки с полями transfer.FIELDS читаются пачками по batch_size.
+        """
+        query = select(Subscription.name, Subscription.price, Subscription.payment_day,
+                       Subscription.billing_period, Category.name.label("category"),
+                       Subscription.next_payment_date, Subscription.is_active) \
+            .join(User, User.id == Subscription.user_id) \
+            .outerjoin(Category, Category.id == Subscription.category_id) \
+            .where(User.telegram_id == telegram_id) \
+            .order_by(Subscription.id) \
+            .execution_options(yield_per=batch_size)
+
+        result = await session.stream(query)
+        async for row in result:
+            yield row._mapping
+
     # Получить ближайшие платежи
     @staticmethod
-    def get_upcoming_payments(session, telegram_id, days_ahead=7):
+    async def get_upcoming_payments(session, telegram_id, days_ahead=7):
         """Получить ближайшие платежи"""
         today = date.today()
         end_date = today + timedelta(days=days_ahead)
 
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
-            return []
-
-        subscriptions = session.query(Subscription).filter(
-            Subscription.user_id == user.id,
-            Subscription.is_active == True,
-            Subscription.next_payment_date >= today,
-            Subscription.next_payment_date <= end_date
-        ).order_by(Subscription.next_payment_date).all()
+        result = await session.execute(
+            select(Subscription).join(Subscription.user)
+            .options(joinedload(Subscription.category)).where(
+                User.telegram_id == telegram_id,
+                Subscription.is_active == True,
+                Subscription.next_payment_date >= today,
+                Subscription.next_payment_date <= end_date
+            ).order_by(Subscription.next_payment_date))
 
-        return subscriptions
+        return result.scalars().all()
 
-    # Рассчитать суммы расходов
+    # Получить суммы расходов пользователя
     @staticmethod
-    def calculate_totals(session, telegram_id):
-        """Рассчитать суммы расходов"""
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+    async def calculate_totals(session, telegram_id):
+        """Получить суммы расходов пользователя из агрегата user_spending"""
+        result = await session.execute(
+            select(UserSpending.monthly_total, UserSpending.yearly_total)
+            .join(User, User.id == UserSpending.user_id)
+            .where(User.telegram_id == telegram_id))
+        row = result.first()
+        if row is None:
             return {"monthly": 0.0, "yearly": 0.0}
+        return {"monthly": round(row.monthly_total, 2),
+                "yearly": round(row.yearly_total, 2)}
+
+    # Потоково получить суммы расходов всех пользователей
+    @staticmethod
+    async def iter_all_totals(session, batch_size=1000):
+        """Потоково получить суммы расходов всех пользователей
 
-        subscriptions = session.query(Subscription).filter(Subscription.user_id == user.id,
-                                                           Subscription.is_active == True).all()
-        monthly_total = 0.0
-        yearly_total = 0.0
-        for sub in subscriptions:
-            if sub.billing_period == "monthly":
-                monthly_total += sub.price
-                yearly_total += sub.price * 12
-            elif sub.billing_period == "yearly":
-                monthly_total += sub.price / 12
-                yearly_total += sub.price
-            elif sub.billing_period == "weekly":
-                monthly_total += sub.price * 4.33
-                yearly_total += sub.price * 52
-
-        return {"monthly": round(monthly_total, 2),
-                "yearly": round(yearly_total, 2)}
+        Строки (telegram_id, monthly, yearly) читаются из агрегата user_spending
+        пачками по batch_size, пользователи с нулевой суммой пропускаются.
+        """
+        query = select(User.telegram_id, UserSpending.monthly_total, UserSpending.yearly_total) \
+            .join(UserSpending, UserSpending.user_id == User.id) \
+            .where(UserSpending.monthly_total > SpendingService.EPSILON) \
+            .execution_options(yield_per=batch_size)
+
+        result = await session.stream(query)
+        async for row in result:
+            yield row
 
     # Установить количество дней для уведомлений
     @staticmethod
-    def set_notification_days(session, telegram_id, days):
+    async def set_notification_days(session, telegram_id, days):
         """Установить количество дней для уведомлений"""
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
-            return False
-
-        user.notification_days = max(0, min(30, days))
-        session.commit()
-        return True
+        result = await session.execute(
+            update(User).where(User.telegram_id == telegram_id)
+            .values(notification_days=max(0, min(MAX_NOTIFICATION_DAYS, days)))
+            .execution_options(synchronize_session=False))
+        return result.rowcount > 0
 
     # Получить все категории
     @staticmethod
-    def get_categories(session):
+    async def get_categories(session):
         """Получить все категории"""
-        return session.query(Category).order_by(Category.name).all()
+        result = await session.execute(select(Category).order_by(Category.name))
+        return result.scalars().all()
 
     # Обновить даты следующих платежей для всех активных подписок
     @staticmethod
-    def update_next_payment_dates(session):
-        """Обновить даты следующих платежей для всех активных подписок"""
+    async def update_next_payment_dates(session, chunk_size=1000):
+        """Обновить даты следующих платежей для всех активных подписок
+
+        Просроченные подписки читаются пачками по id, новые даты пишутся
+        пакетным UPDATE по первичному ключу. Возвращает число обновленных строк.
+        """
         today = date.today()
-        subscriptions = session.query(Subscription).filter(Subscription.is_active == True,
-                                                           Subscription.next_payment_date < today).all()
-
-        for sub in subscriptions:
-            next_date = sub.next_payment_date
-
-            while next_date < today:
-                if sub.billing_period == "monthly":
-                    try:
-                        next_date = date(next_date.year, next_date.month + 1, sub.payment_day)
-                    except ValueError:
-                        if next_date.month == 12:
-                            next_year = next_date.year + 1
-                            next_month = 1
-                        else:
-                            next_year = next_date.year
-                            next_month = next_date.month + 1
-
-                        _, days_in_month = calendar.monthrange(next_year, next_month)
-                        actual_day = min(sub.payment_day, days_in_month)
-                        next_date = date(next_year, next_month, actual_day)
-
-                elif sub.billing_period == "yearly":
-                    try:
-                        next_date = date(next_date.year + 1, next_date.month, sub.payment_day)
-                    except ValueError:
-                        _, days_in_month = calendar.monthrange(next_date.year + 1, next_date.month)
-                        actual_day = min(sub.payment_day, days_in_month)
-                        next_date = date(next_date.year + 1, next_date.month, actual_day)
-
-                elif sub.billing_period == "weekly":
-                    next_date += timedelta(days=7)
-            sub.next_payment_date = next_date
-        session.commit()
+        advanced = 0
+        last_id = 0
+
+        while True:
+            result = await session.execute(
+                select(Subscription.id, Subscription.next_payment_date,
+                       Subscription.billing_period, Subscription.payment_day)
+                .where(Subscription.is_active == True,
+                       Subscription.next_payment_date < today,
+                       Subscription.id > last_id)
+                .order_by(Subscription.id)
+                .limit(chunk_size))
+            rows = result.all()
+            if not rows:
+                break
+
+            updates = []
+            for row in rows:
+                next_date = SubscriptionService._advance_payment_date(
+                    row.next_payment_date, row.billing_period, row.payment_day, today)
+                if next_date != row.next_payment_date:
+                    updates.append({"id": row.id, "next_payment_date": next_date})
+
+            if updates:
+                await session.execute(update(Subscription), updates)
+            await session.commit()
+
+            advanced += len(updates)
+            last_id = rows[-1].id
+
+        return advanced
+
+    # Первая дата платежа не раньше указанного дня
+    @staticmethod
+    def _advance_payment_date(next_date, billing_period, payment_day, today):
+        """Первая дата платежа не раньше указанного дня
+
+        Считается сразу, без перебора периодов: для месячных и годовых подписок
+        день платежа ограничивается длиной месяца.
+        """
+        if next_date >= today:
+            return next_date
+
+        if billing_period == "weekly":
+            weeks = -(-(today - next_date).days // 7)
+            return next_date + timedelta(weeks=weeks)
+
+        if billing_period == "monthly":
+            step = 1
+        elif billing_period == "yearly":
+            step = 12
+        else:
+            return next_date
+
+        months = (today.year - next_date.year) * 12 + today.month - next_date.month
+        periods = max(1, -(-months // step))
+        payment_date = SubscriptionService._shift_months(next_date, periods * step, payment_day)
+        if payment_date < today:
+            payment_date = SubscriptionService._shift_months(next_date, (periods + 1) * step,
+                                                             payment_day)
+        return payment_date
+
+    # Сдвинуть дату на несколько месяцев с учетом дня платежа
+    @staticmethod
+    def _shift_months(base_date, months, payment_day):
+        """Сдвинуть дату на несколько месяцев с учетом дня платежа"""
+        year, month = divmod(base_date.year * 12 + base_date.month - 1 + months, 12)
+        _, days_in_month = calendar.monthrange(year, month + 1)
+        return date(year, month + 1, min(payment_day, days_in_month))
+
+
+class SpendingService:
+    """Агрегаты расходов user_spending и category_spending
+
+    Каждое изменение подписки применяется к агрегатам в той же транзакции
+    как приращение, поэтому суммы читаются одной строкой без пересчета.
+    """
+
+    # Суммы меньше этой считаются нулевыми (остаток округления при вычитании)
+    EPSILON = 0.005
+
+    # Учесть подписку в агрегатах (sign=-1 - вычесть)
+    @staticmethod
+    async def apply(session, subscription, sign=1, force=False):
+        """Учесть подписку в агрегатах (sign=-1 - вычесть)
+
+        Неактивные подписки в суммы не входят и пропускаются; force=True
+        применяет приращение независимо от is_active (для переключения).
+        """
+        if not subscription.is_active and not force:
+            return
+
+        monthly, yearly = CostNormalizer.costs(subscription.price, subscription.billing_period)
+        await SpendingService.add(session, subscription.user_id,
+                                  {subscription.category_id or 0: (sign * monthly, sign * yearly)})
+
+    # Добавить приращения к агрегатам пользователя
+    @staticmethod
+    async def add(session, user_id, deltas):
+        """Добавить приращения к агрегатам пользователя
+
+        deltas - словарь category_id (0 - без категории) -> (в месяц, в год);
+        итог пользователя получает сумму приращений по всем категориям.
+        """
+        if not deltas:
+            return
+
+        rows = [{"user_id": user_id, "category_id": category_id,
+                 "monthly_total": monthly, "yearly_total": yearly}
+                for category_id, (monthly, yearly) in deltas.items()]
+        total = {"user_id": user_id,
+                 "monthly_total": sum(row["monthly_total"] for row in rows),
+                 "yearly_total": sum(row["yearly_total"] for row in rows)}
+
+        for model, values in ((UserSpending, total), (CategorySpending, rows)):
+            statement = sqlite_insert(model).values(values)
+            statement = statement.on_conflict_do_update(
+                index_elements=[column.name for column in model.__table__.primary_key],
+                set_={"monthly_total": model.monthly_total + statement.excluded.monthly_total,
+                      "yearly_total": model.yearly_total + statement.excluded.yearly_total})
+            await session.execute(statement)
+
+    # Запросы полного пересчета агрегатов
+    @staticmethod
+    def rebuild_statements():
+        """Запросы полного пересчета агрегатов (для синхронной и асинхронной сессии)"""
+        monthly, yearly = CostNormalizer.monthly_sql(), CostNormalizer.yearly_sql()
+        category_id = func.coalesce(Subscription.category_id, 0)
+        active = Subscription.is_active == True
+        return [
+            delete(CategorySpending),
+            delete(UserSpending),
+            insert(UserSpending).from_select(
+                ["user_id", "monthly_total", "yearly_total"],
+                select(Subscription.user_id, func.sum(monthly), func.sum(yearly))
+                .where(active).group_by(Subscription.user_id)),
+            insert(CategorySpending).from_select(
+                ["user_id", "category_id", "monthly_total", "yearly_total"],
+                select(Subscription.user_id, category_id, func.sum(monthly), func.sum(yearly))
+                .where(active).group_by(Subscription.user_id, category_id)),
+        ]
+
+    # Пересчитать агрегаты по подпискам
+    @staticmethod
+    async def rebuild(session):
+        """Пересчитать агрегаты по подпискам"""
+        for statement in SpendingService.rebuild_statements():
+            await session.execute(statement)
+        await session.commit()
+
+    # Сравнить агрегаты с полным пересчетом
+    @staticmethod
+    async def verify(session, tolerance=0.01):
+        """Сравнить агрегаты с полным пересчетом
+
+        Возвращает расхождения: (user_id, category_id, хранимое, пересчитанное),
+        category_id = None для итогов пользователя.
+        """
+        monthly, yearly = CostNormalizer.monthly_sql(), CostNormalizer.yearly_sql()
+        category_id = func.coalesce(Subscription.category_id, 0)
+        active = Subscription.is_active == True
+
+        expected_users = {row[0]: (row[1], row[2]) for row in await session.execute(
+            select(Subscription.user_id, func.sum(monthly), func.sum(yearly))
+            .where(active).group_by(Subscription.user_id))}
+        expected_categories = {(row[0], row[1]): (row[2], row[3]) for row in await session.execute(
+            select(Subscription.user_id, category_id, func.sum(monthly), func.sum(yearly))
+            .where(active).group_by(Subscription.user_id, category_id))}
+
+        stored_users = {row[0]: (row[1], row[2]) for row in await session.execute(
+            select(UserSpending.user_id, UserSpending.monthly_total, UserSpending.yearly_total))}
+        stored_categories = {(row[0], row[1]): (row[2], row[3]) for row in await session.execute(
+            select(CategorySpending.user_id, CategorySpending.category_id,
+                   CategorySpending.monthly_total, CategorySpending.yearly_total))}
+
+        mismatches = []
+        for stored, expected, key_of in ((stored_users, expected_users, lambda key: (key, None)),
+                                         (stored_categories, expected_categories, lambda key: key)):
+            for key in stored.keys() | expected.keys():
+                have = stored.get(key, (0.0, 0.0))
+                want = expected.get(key, (0.0, 0.0))
+                if any(abs(a - b) > tolerance for a, b in zip(have, want)):
+                    mismatches.append((*key_of(key), have, want))
+        return mismatches
 
 
 class NotificationService:
     # Получить подписки, по которым нужно отправить уведомления
     @staticmethod
-    def get_subscriptions_for_notification(session):
-        """Получить подписки, по которым нужно отправить уведомления"""
+    async def get_subscriptions_for_notification(session):
+        """Получить подписки, по которым нужно отправить уведомления
+
+        Один запрос на всех пользователей: дата платежа сравнивается с
+        today + notification_days прямо в SQL, пользователь и категория
+        подгружаются сразу, чтобы при форматировании не было запросов на строку.
+        """
         today = date.today()
-        users = session.query(User).filter(User.notification_days > 0).all()
-        subscriptions_to_notify = []
-
-        for user in users:
-            notify_date = today + timedelta(days=user.notification_days)
-            subscriptions = session.query(Subscription).filter(Subscription.user_id == user.id,
-                                                               Subscription.is_active == True,
-                                                               Subscription.notifications_enabled == True,
-                                                               Subscription.next_payment_date == notify_date).all()
-            subscriptions_to_notify.extend(subscriptions)
-        return subscriptions_to_notify
+        notify_date = func.date(today.isoformat(),
+                                func.printf('+%d days', User.notification_days))
+
+        result = await session.execute(
+            select(Subscription)
+            .join(Subscription.user)
+            .options(contains_eager(Subscription.user), joinedload(Subscription.category))
+            .where(Subscription.is_active == True,
+                   Subscription.notifications_enabled == True,
+                   Subscription.next_payment_date > today,
+                   Subscription.next_payment_date <= today + timedelta(days=MAX_NOTIFICATION_DAYS),
+                   User.notification_days > 0,
+                   Subscription.next_payment_date == notify_date)
+            .order_by(User.telegram_id, Subscription.next_payment_date))
+        return result.scalars().all()
 
     # Форматировать сообщение для уведомления
     @staticmethod
     def format_notification_message(subscription):
         """Форматировать сообщение для уведомления"""
+        return NotificationService.build_digest(
+            [NotificationService.format_digest_item(subscription)])[0]
+
+    # Форматировать сводку по всем подпискам пользователя
+    @staticmethod
+    def format_digest_messages(subscriptions):
+        """Форматировать сводку по всем подпискам пользователя"""
+        return NotificationService.build_digest(
+            [NotificationService.format_digest_item(subscription) for subscription in subscriptions])
+
+    # Форматировать блок одной подписки
+    @staticmethod
+    def format_digest_item(subscription):
+        """Форматировать блок одной подписки"""
         today = date.today()
         days_until = (subscription.next_payment_date - today).days
         period_texts = {
@@ -283,12 +648,154 @@ class NotificationService:
         }
         category_text = f"{subscription.category.name}" if subscription.category else ""
         return (
-            f"*Напоминание о платеже*\n\n"
             f"*Подписка:* {subscription.name}\n"
             f"*Сумма:* {subscription.price} {subscription.currency}\n"
             f"*Дата платежа:* {subscription.next_payment_date.strftime('%d.%m.%Y')}\n"
             f"*Осталось дней:* {days_until}\n"
             f"*Период:* {period_texts.get(subscription.billing_period, subscription.billing_period)}\n"
-            f"{category_text}\n\n"
-            f"_Не забудьте оплатить вовремя!_"
+            f"{category_text}"
         )
+
+    # Собрать блоки подписок в сообщения с учетом лимита длины
+    @staticmethod
+    def build_digest(items, limit=config.MESSAGE_MAX_LENGTH):
+        """Собрать блоки подписок в сообщения с учетом лимита длины"""
+        return [text for text, _ in NotificationService.build_digest_chunks(items, limit)]
+
+    # Собрать сообщения сводки вместе с номерами вошедших в них блоков
+    @staticmethod
+    def build_digest_chunks(items, limit=config.MESSAGE_MAX_LENGTH):
+        """Собрать сообщения сводки вместе с номерами вошедших в них блоков
+
+        Блоки не разрываются: если следующий не помещается в сообщение,
+        он переносится в новое.
+        """
+        header = "*Напоминание о платеже*\n\n" if len(items) == 1 else "*Напоминание о платежах*\n\n"
+        footer = "\n\n_Не забудьте оплатить вовремя!_"
+        separator = "\n\n"
+        budget = limit - len(header) - len(footer)
+
+        chunks = [[]]
+        size = 0
+        for index, item in enumerate(items):
+            extra = min(len(item), budget) + (len(separator) if chunks[-1] else 0)
+            if chunks[-1] and size + extra > budget:
+                chunks.append([])
+                size = 0
+                extra = min(len(item), budget)
+            chunks[-1].append(index)
+            size += extra
+
+        return [(header + separator.join(items[index][:budget] for index in chunk) + footer, chunk)
+                for chunk in chunks if chunk]
+
+    # Поставить напоминания на сегодня в очередь отправки
+    @staticmethod
+    async def enqueue_notifications(session, scheduled_for, chunk_size=500):
+        """Поставить напоминания на сегодня в очередь отправки
+
+        Повторный вызов за ту же дату ничего не дублирует благодаря
+        уникальному индексу (subscription_id, scheduled_for).
+        """
+        subscriptions = await NotificationService.get_subscriptions_for_notification(session)
+        rows = [{"user_id": subscription.user_id,
+                 "subscription_id": subscription.id,
+                 "message": NotificationService.format_digest_item(subscription),
+                 "scheduled_for": scheduled_for,
+                 "is_sent": False}
+                for subscription in subscriptions]
+
+        statement = sqlite_insert(Notification).on_conflict_do_nothing(
+            index_elements=["subscription_id", "scheduled_for"])
+        for start in range(0, len(rows), chunk_size):
+            await session.execute(statement, rows[start:start + chunk_size])
+        await session.commit()
+        return len(rows)
+
+    # Получить следующую пачку неотправленных напоминаний
+    @staticmethod
+    async def get_pending_notifications(session, since, until, after_user_id=0, users_limit=100):
+        """Получить следующую пачку неотправленных напоминаний
+
+        Пачка набирается по пользователям (user_id > after_user_id), чтобы все
+        напоминания одного пользователя попали в одну сводку.
+        """
+        pending = (Notification.is_sent == False,
+                   Notification.scheduled_for >= since,
+                   Notification.scheduled_for <= until)
+
+        result = await session.execute(
+            select(Notification.user_id)
+            .where(*pending, Notification.user_id > after_user_id)
+            .group_by(Notification.user_id)
+            .order_by(Notification.user_id)
+            .limit(users_limit))
+        user_ids = result.scalars().all()
+        if not user_ids:
+            return []
+
+        result = await session.execute(
+            select(Notification)
+            .join(Notification.user)
+            .options(contains_eager(Notification.user),
+                     joinedload(Notification.subscription).joinedload(Subscription.category))
+            .where(*pending, Notification.user_id.in_(user_ids))
+            .order_by(Notification.user_id, Notification.id))
+        return result.scalars().all()
+
+    # Актуально ли напоминание на момент отправки
+    @staticmethod
+    def is_notification_current(notification, today=None):
+        """Актуально ли напоминание на момент отправки
+
+        Подписку могли удалить, приостановить или отключить для нее напоминания
+        после постановки в очередь, а дата платежа могла наступить или сдвинуться
+        на следующий период (после перезапуска на другой день).
+        """
+        today = today or date.today()
+        subscription = notification.subscription
+        days = notification.user.notification_days
+        return (subscription is not None
+                and subscription.is_active
+                and subscription.notifications_enabled
+                and days > 0
+                and today < subscription.next_payment_date <= today + timedelta(days=days))
+
+    # Закрыть устаревшие неотправленные напоминания
+    @staticmethod
+    async def expire_notifications(session, before):
+        """Закрыть неотправленные напоминания, запланированные раньше before
+
+        Напоминание отмечается is_sent без sent_at: оно больше не досылается,
+        но отличается от отправленного. Возвращает число закрытых напоминаний.
+        """
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.is_sent == False, Notification.scheduled_for < before)
+            .values(is_sent=True, sent_at=None)
+            .execution_options(synchronize_session=False))
+        await session.commit()
+        return result.rowcount
+
+    # Отметить напоминания отправленными
+    @staticmethod
+    async def mark_notifications_sent(session, notification_ids, chunk_size=500):
+        """Отметить напоминания отправленными"""
+        await NotificationService._close_notifications(session, notification_ids, datetime.now(),
+                                                       chunk_size)
+
+    # Закрыть напоминания без отправки
+    @staticmethod
+    async def skip_notifications(session, notification_ids, chunk_size=500):
+        """Закрыть напоминания без отправки: is_sent без sent_at, как expire_notifications"""
+        await NotificationService._close_notifications(session, notification_ids, None, chunk_size)
+
+    @staticmethod
+    async def _close_notifications(session, notification_ids, sent_at, chunk_size):
+        for start in range(0, len(notification_ids), chunk_size):
+            await session.execute(
+                update(Notification)
+                .where(Notification.id.in_(notification_ids[start:start + chunk_size]))
+                .values(is_sent=True, sent_at=sent_at)
+                .execution_options(synchronize_session=False))
+        await session.commit()
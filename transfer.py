@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import math
+from datetime import date
+
+# Поля файла импорта/экспорта
+FIELDS = ["name", "price", "payment_day", "billing_period", "category", "next_payment_date",
+          "is_active"]
+BILLING_PERIODS = ("monthly", "yearly", "weekly")
+TRUE_VALUES = ("1", "true", "yes", "да")
+FALSE_VALUES = ("0", "false", "no", "нет")
+MAX_PRICE = 10_000_000
+
+
+# Определить формат файла по имени и первому символу
+def detect_format(filename, first_char):
+    """Определить формат файла по имени и первому символу: csv, json или jsonl"""
+    filename = (filename or "").lower()
+    for extension in ("jsonl", "json", "csv"):
+        if filename.endswith(f".{extension}"):
+            return extension
+    if first_char == "[":
+        return "json"
+    if first_char == "{":
+        return "jsonl"
+    return "csv"
+
+
+# Прочитать записи из файла по одной
+def iter_records(stream, file_format):
+    """Прочитать записи из текстового потока по одной: (номер записи, dict)"""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for number, record in enumerate(reader, 1):
+            yield number, record
+    else:
+        yield from enumerate(iter_json_objects(stream), 1)
+
+
+# Потоковый разбор JSON-массива объектов или JSON Lines
+def iter_json_objects(stream, chunk_size=64 * 1024):
+    """Потоковый разбор JSON-массива объектов или JSON Lines
+
+    Файл читается кусками по chunk_size, объекты выделяются
+    JSONDecoder.raw_decode, поэтому в памяти держится только текущий кусок.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_array = None
+    eof = False
+
+    while True:
+        # Пропуск разделителей между объектами
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+
+        if position >= len(buffer):
+            if in_array:
+                raise ValueError("JSON-массив не закрыт")
+            return
+
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        elif in_array and buffer[position] == "]":
+            return
+
+        if buffer[position] != "{":
+            raise ValueError("ожидался JSON-объект")
+
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    raise ValueError("некорректный JSON")
+                buffer = buffer[position:] + chunk
+                position = 0
+        position = end
+        yield record
+
+
+# Проверить запись и привести ее к полям подписки
+def parse_record(record, category_ids):
+    """Проверить запись и привести ее к полям подписки
+
+    category_ids - словарь название категории в нижнем регистре -> id.
+    При ошибке выбрасывается ValueError с понятным пользователю текстом.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("запись должна быть объектом")
+
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("не указано название")
+    if len(name) > 100:
+        raise ValueError("название длиннее 100 символов")
+
+    try:
+        price = float(str(record.get("price", "")).replace(",", "."))
+    except ValueError:
+        raise ValueError("стоимость должна быть числом")
+    # float() принимает nan, inf и 1e400; такие суммы ломают агрегаты user_spending
+    if not math.isfinite(price):
+        raise ValueError("стоимость должна быть числом")
+    if price <= 0:
+        raise ValueError("стоимость должна быть больше 0")
+    if price > MAX_PRICE:
+        raise ValueError(f"стоимость должна быть не больше {MAX_PRICE}")
+
+    try:
+        payment_day = int(record.get("payment_day", ""))
+    except (TypeError, ValueError):
+        raise ValueError("день платежа должен быть числом")
+    if not 1 <= payment_day <= 31:
+        raise ValueError("день платежа должен быть от 1 до 31")
+
+    billing_period = str(record.get("billing_period") or "monthly").strip().lower()
+    if billing_period not in BILLING_PERIODS:
+        raise ValueError(f"неизвестная периодичность {billing_period}")
+
+    category_id = None
+    category = str(record.get("category") or "").strip()
+    if category:
+        category_id = category_ids.get(category.lower())
+        if category_id is None:
+            raise ValueError(f"неизвестная категория {category}")
+
+    next_payment_date = None
+    if record.get("next_payment_date"):
+        try:
+            next_payment_date = date.fromisoformat(str(record["next_payment_date"]))
+        except ValueError:
+            raise ValueError("дата следующего платежа должна быть в формате ГГГГ-ММ-ДД")
+
+    is_active = record.get("is_active", True)
+    if isinstance(is_active, str):
+        value = is_active.strip().lower()
+        if value in TRUE_VALUES or not value:
+            is_active = True
+        elif value in FALSE_VALUES:
+            is_active = False
+        else:
+            raise ValueError("is_active должно быть true или false")
+
+    return {"name": name, "price": price, "payment_day": payment_day,
+            "billing_period": billing_period, "category_id": category_id,
+            "next_payment_date": next_payment_date, "is_active": bool(is_active)}
+
+
+class ExportWriter:
+    """Построчная запись подписок в CSV или JSON-массив"""
+
+    def __init__(self, stream, file_format="csv"):
+        self.stream = stream
+        self.file_format = file_format
+        self.rows = 0
+        if file_format == "csv":
+            self.csv = csv.writer(stream)
+            self.csv.writerow(FIELDS)
+        else:
+            stream.write("[")
+
+    # Записать одну подписку
+    def write(self, row):
+        """Записать одну подписку"""
+        values = {field: row[field] for field in FIELDS}
+        values["next_payment_date"] = values["next_payment_date"].isoformat()
+        if self.file_format == "csv":
+            self.csv.writerow([values[field] for field in FIELDS])
+        else:
+            self.stream.write(("," if self.rows else "") + "\n"
+                              + json.dumps(values, ensure_ascii=False))
+        self.rows += 1
+
+    # Завершить документ
+    def close(self):
+        """Завершить документ"""
+        if self.file_format != "csv":
+            self.stream.write("\n]\n")
+
+
+# Открыть загруженный файл как текстовый поток
+def open_text(binary_stream):
+    """Открыть загруженный файл как текстовый поток (UTF-8, с BOM или без)"""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import secrets
+import signal
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+# Дождаться обработки уже принятых апдейтов
+async def drain_updates(handler, timeout=config.WEBHOOK_DRAIN_TIMEOUT):
+    """Дождаться обработки уже принятых апдейтов
+
+    SimpleRequestHandler отвечает Telegram сразу и обрабатывает апдейт в
+    фоновой задаче; при остановке эти задачи нужно завершить до закрытия
+    сессии бота, иначе ответы пользователям потеряются.
+    """
+    tasks = set(handler._background_feed_update_tasks)
+    if not tasks:
+        return
+    logger.info(f"Ожидание обработки {len(tasks)} апдейтов...")
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    if pending:
+        logger.warning(f"Не дождались обработки {len(pending)} апдейтов за {timeout} с")
+
+
+# Создать aiohttp-приложение для приема апдейтов
+def create_webhook_app(bot, dp, secret_token, path=config.WEBHOOK_PATH):
+    """Создать aiohttp-приложение для приема апдейтов
+
+    Запросы без правильного X-Telegram-Bot-Api-Secret-Token отклоняются.
+    """
+    app = web.Application()
+    handler = SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token)
+
+    async def on_shutdown(app):
+        await drain_updates(handler)
+
+    # Обработчик остановки регистрируется раньше закрытия сессии бота в handler.register
+    app.on_shutdown.append(on_shutdown)
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+# Прием апдейтов через вебхук
+async def run_webhook(bot, dp, stop_event=None):
+    """Прием апдейтов через вебхук
+
+    Запускает HTTP-сервер на WEBHOOK_HOST:WEBHOOK_PORT, регистрирует вебхук в
+    Telegram и работает до SIGINT/SIGTERM (или stop_event). При остановке
+    сервер перестает принимать запросы и дожидается обработки принятых
+    апдейтов. Вебхук не удаляется: апдейты, пришедшие во время перезапуска,
+    Telegram доставит повторно.
+    """
+    secret_token = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    app = create_webhook_app(bot, dp, secret_token)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Вебхук слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    try:
+        await bot.set_webhook(url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+                              secret_token=secret_token,
+                              allowed_updates=dp.resolve_used_update_types())
+        await stop_event.wait()
+    finally:
+        logger.info("Остановка вебхука...")
+        await runner.cleanup()